@@ -1,6 +1,6 @@
-from typing import List
+from typing import Callable, Dict, List
 
-from constants import ACTION, TREASURE, VICTORY, ATTACK, REACTION, ACTION_PHASE, BUY_PHASE, TREASURE_PHASE
+from constants import ACTION, TREASURE, VICTORY, ATTACK, REACTION, ACTION_PHASE, BUY_PHASE, TREASURE_PHASE, TYPE_FLAGS
 from abc import ABC, abstractmethod
 
 
@@ -8,9 +8,37 @@ class Card(ABC):
     """
     Base class for all cards
     """
+    # Phase in which cards of a type can be played, declared by the abstract type classes
+    play_phase = None
+    worth = 0
+    victory_points = 0
+    # Number of cards the card always draws when played
+    draws = 0
+
+    # Metadata computed once per card class, see __init_subclass__
+    types: int = 0
+    tags: tuple = ()
+    playability: Dict[str, Callable[['State'], bool]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        tags = []
+        playability = {}
+        for klass in cls.__mro__:
+            attributes = vars(klass)
+            if isinstance(attributes.get('tag'), str) and attributes['tag'] not in tags:
+                tags.append(attributes['tag'])
+            # Every type class declaring a play phase contributes its predicate for that phase
+            if attributes.get('play_phase') and attributes['play_phase'] not in playability:
+                playability[attributes['play_phase']] = getattr(klass, '_is_playable')
+        cls.tags = tuple(tags)
+        cls.types = sum(TYPE_FLAGS[tag] for tag in tags)
+        cls.playability = playability
 
     def __init__(self, num_players):
-        self.supply_pile_size = self.get_starting_supply_pile_size(num_players)
+        self.starting_supply_pile_size = self.get_starting_supply_pile_size(num_players)
+        # Position of the card in the supply, set by the first State the card is placed in and fixed afterwards
+        self.supply_index: int = None
 
     def __str__(self):
         return self.name
@@ -22,10 +50,6 @@ class Card(ABC):
     def name(self) -> str:
         return self.__class__.__name__
 
-    @property
-    def tags(self) -> tuple:
-        return tuple(getattr(x, 'tag') for x in self.__class__.__mro__)
-
     @property
     @abstractmethod
     def price(self) -> int:
@@ -43,17 +67,21 @@ class Card(ABC):
 
     @abstractmethod
     def resolve(self, state: 'State'):
+        """
+        Resolves the effect of the card. Effects that prompt a player are written as coroutines (yield from the
+        player's prompt methods) and are driven by Player.play; the same holds for attack and react.
+        """
         pass
 
     def is_playable(self, state: 'State') -> bool:
-        return any(getattr(x, '_is_playable')(state) for x in self.__class__.__mro__ if hasattr(x, '_is_playable'))
+        predicate = self.playability.get(state.phase)
+        return predicate is not None and predicate(state)
 
-    def is_supply_empty(self) -> bool:
-        return not bool(self.supply_pile_size)
+    def is_supply_empty(self, state: 'State') -> bool:
+        return not state.supply_sizes[self.supply_index]
 
-    def gain(self):
-        self.supply_pile_size = self.supply_pile_size - 1
-        return self
+    def gain(self, state: 'State'):
+        return state.remove_from_supply(self)
 
     @staticmethod
     @abstractmethod
@@ -88,6 +116,7 @@ class Treasure(Card):
     Abstract class for Treasure cards
     """
     tag = TREASURE
+    play_phase = TREASURE_PHASE
 
     @property
     @abstractmethod
@@ -107,6 +136,7 @@ class Action(Card):
     Abstract class for Action cards
     """
     tag = ACTION
+    play_phase = ACTION_PHASE
 
     @staticmethod
     def _is_playable(state: 'State') -> bool:
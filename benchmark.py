@@ -0,0 +1,256 @@
+"""
+Benchmarks of the simulation hot paths. All benchmarks use fixed seeds and the FIRST_GAME kingdom, so results of
+different commits are comparable. Results are written as JSON:
+    python benchmark.py --output before.json
+    ... change the engine ...
+    python benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Type
+
+import bot
+from bots import RandomBot, ExpensiveBot, BigMoneyBot, MonteCarloBot
+from constants import ACTION_PHASE
+from player import Player
+from recommended_kingdoms import FIRST_GAME, initialize_kingdom
+from simulation import run_game
+from state import State
+
+SEED = 0
+# Bots played against each other. MonteCarloBot is left out by default: its playouts are games of its policy bot,
+# so it is covered by the policy's numbers and would dominate the run time.
+BOT_CLASSES = [RandomBot, ExpensiveBot, BigMoneyBot]
+
+# Importing the engine in a fresh interpreter must stay within the budget and must not load the heavy modules, which
+# are only needed for feature extraction, recording, analysis or process pools
+STARTUP_BUDGET_SECONDS = 0.05
+ENGINE_MODULES = ['state', 'player', 'cards', 'abstract_cards', 'simulation']
+HEAVY_MODULES = ['numpy', 'pandas', 'multiprocessing', 'asyncio']
+
+
+def games_per_second(bot_classes: List[Type[Player]] = BOT_CLASSES, num_games: int = 200) -> Dict[str, float]:
+    """
+    Plays num_games seeded games for every pairing of the bots (including self-play) and returns the games per second
+    per pairing, keyed 'BotA-BotB'
+    """
+    results = {}
+    for pairing in itertools.combinations_with_replacement(bot_classes, 2):
+        start = time.perf_counter()
+        for i in range(num_games):
+            players = [bot_class(f'{bot_class.__name__}{seat + 1}') for seat, bot_class in enumerate(pairing)]
+            run_game(players, FIRST_GAME, SEED + i)
+        elapsed = time.perf_counter() - start
+        results['-'.join(bot_class.__name__ for bot_class in pairing)] = num_games / elapsed
+    return results
+
+
+def search_strength(num_games: int = 6, playouts: int = 8) -> Dict:
+    """
+    Plays MonteCarloBot against BigMoneyBot, its playout policy, in seeded games with alternating seats. The search
+    should at least match its policy; seeded results shift whenever the engine's random stream does, so this is
+    tracked here rather than asserted in the tests.
+    """
+    wins = losses = margin = 0
+    for i in range(num_games):
+        players = [MonteCarloBot('MonteCarloBot', playouts=playouts), BigMoneyBot('BigMoneyBot')]
+        if i % 2:
+            players.reverse()
+        victory_points = run_game(players, FIRST_GAME, SEED + i).victory_points
+        difference = victory_points['MonteCarloBot'] - victory_points['BigMoneyBot']
+        wins += difference > 0
+        losses += difference < 0
+        margin += difference
+    return {
+        'games': num_games,
+        'playouts': playouts,
+        'wins': wins,
+        'losses': losses,
+        'mean_margin': margin / num_games if num_games else 0.0,
+    }
+
+
+def benchmark_state(num_turns: int = 6) -> State:
+    """
+    Returns a seeded two player BigMoney game after num_turns turns, so that the players have cards in every area
+    """
+    players = [BigMoneyBot('BigMoneyBot1'), BigMoneyBot('BigMoneyBot2')]
+    state = State(players, initialize_kingdom(FIRST_GAME, len(players)), seed=SEED)
+    for _ in range(num_turns):
+        for player in players:
+            state.play_turn(player)
+        state.turn_number += 1
+    return state
+
+
+def time_each(call: Callable, setup: Callable = None, number: int = 10_000) -> float:
+    """
+    Returns the mean time of call in nanoseconds. Only the call is timed; setup runs before every call, e.g. to
+    restore a snapshot. The overhead of the timer itself is subtracted.
+    """
+    timer = time.perf_counter_ns
+    overhead = min(-timer() + timer() for _ in range(1000))
+    total = 0
+    for _ in range(number):
+        if setup is not None:
+            setup()
+        start = timer()
+        call()
+        total += timer() - start - overhead
+    return max(total / number, 0.0)
+
+
+def call_costs(number: int = 10_000) -> Dict[str, float]:
+    """
+    Returns the mean cost in nanoseconds of the hot path functions
+    """
+    state = benchmark_state()
+    player = state.players[0]
+    snapshot = state.snapshot()
+    restore = lambda: state.restore(snapshot)
+
+    state.phase = ACTION_PHASE
+    state.current_player = player
+    cards = state.supply
+    card_cycle = itertools.cycle(cards)
+    money_cycle = itertools.cycle(range(9))
+    bot_state = bot.bot_state
+    # Build the cached encoder outside of the measurement
+    bot_state(player, state)
+
+    return {
+        'Player.draw(5)': time_each(lambda: player.draw(5), restore, number),
+        'Player.cleanup': time_each(player.cleanup, restore, number),
+        'State.affordable_cards': time_each(lambda: state.affordable_cards(next(money_cycle)), None, number),
+        'Card.is_playable': time_each(lambda: next(card_cycle).is_playable(state), None, number),
+        'bot.bot_state': time_each(lambda: bot_state(player, state), None, number // 10),
+    }
+
+
+def peak_memory(num_games: int = 1000, bot_classes: List[Type[Player]] = (BigMoneyBot, BigMoneyBot)) -> int:
+    """
+    Returns the peak traced memory in bytes while playing num_games games
+    """
+    tracemalloc.start()
+    try:
+        for i in range(num_games):
+            players = [bot_class(f'{bot_class.__name__}{seat + 1}') for seat, bot_class in enumerate(bot_classes)]
+            run_game(players, FIRST_GAME, SEED + i)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def startup_cost(runs: int = 5) -> Dict:
+    """
+    Imports the engine modules in fresh interpreters and returns the best import time and the heavy modules loaded
+    """
+    code = (
+        'import sys, time\n'
+        'start = time.perf_counter()\n'
+        f'import {", ".join(ENGINE_MODULES)}\n'
+        'print(time.perf_counter() - start)\n'
+        f'print(",".join(module for module in {HEAVY_MODULES!r} if module in sys.modules))\n'
+    )
+    seconds = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.splitlines()
+        seconds.append(float(output[0]))
+    heavy_modules = output[1].split(',') if len(output) > 1 and output[1] else []
+    return {
+        'import_seconds': min(seconds),
+        'budget_seconds': STARTUP_BUDGET_SECONDS,
+        'heavy_modules': heavy_modules,
+    }
+
+
+def run_benchmarks(num_games: int = 200, number: int = 10_000, memory_games: int = 1000,
+                   search_games: int = 6) -> Dict:
+    """
+    Runs all benchmarks and returns the results together with the commit and Python version
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'seed': SEED,
+        'startup': startup_cost(),
+        'games_per_second': games_per_second(num_games=num_games),
+        'call_ns': call_costs(number),
+        'memory_games': memory_games,
+        'peak_memory_bytes': peak_memory(memory_games),
+        'search_strength': search_strength(search_games),
+    }
+
+
+def compare(baseline: Dict, results: Dict) -> List[str]:
+    """
+    Returns one line per benchmark with the change relative to the baseline. Higher is better for games per second,
+    lower is better for call costs and memory.
+    """
+    lines = []
+    for section in ('games_per_second', 'call_ns'):
+        for name, value in results[section].items():
+            old = baseline.get(section, {}).get(name)
+            if old:
+                lines.append(f'{section} {name}: {old:.1f} -> {value:.1f} ({(value / old - 1) * 100:+.1f}%)')
+    startup = results['startup']
+    if startup['import_seconds'] > startup['budget_seconds'] or startup['heavy_modules']:
+        lines.append(f'startup over budget: {startup["import_seconds"] * 1000:.1f} ms, '
+                     f'heavy modules {startup["heavy_modules"]}')
+    old = baseline.get('startup', {}).get('import_seconds')
+    if old:
+        new = startup['import_seconds']
+        lines.append(f'startup: {old * 1000:.1f} ms -> {new * 1000:.1f} ms ({(new / old - 1) * 100:+.1f}%)')
+    strength = results.get('search_strength')
+    if strength and strength['games']:
+        lines.append(f'search strength: {strength["wins"]}-{strength["losses"]} against BigMoneyBot, '
+                     f'mean margin {strength["mean_margin"]:+.1f}')
+        if strength['losses'] > strength['wins'] or strength['mean_margin'] < 0:
+            lines.append('search strength: MonteCarloBot is weaker than its playout policy')
+    old = baseline.get('peak_memory_bytes')
+    new = results['peak_memory_bytes']
+    if old and baseline.get('memory_games') == results['memory_games']:
+        lines.append(f'peak memory: {old} -> {new} ({(new / old - 1) * 100:+.1f}%)')
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the simulation hot paths')
+    parser.add_argument('--games', type=int, default=200, help='Games per bot pairing')
+    parser.add_argument('--calls', type=int, default=10_000, help='Calls per function')
+    parser.add_argument('--memory-games', type=int, default=1000, help='Games played for the peak memory')
+    parser.add_argument('--search-games', type=int, default=6,
+                        help='MonteCarloBot games against BigMoneyBot for the search strength, 0 to skip')
+    parser.add_argument('--output', help='File to write the JSON results to, default stdout')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.games, args.calls, args.memory_games, args.search_games)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, results):
+            print(line, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
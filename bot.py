@@ -1,6 +1,12 @@
-from typing import Counter, Union, List
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Type
+
+import numpy as np
+
+from abstract_cards import Card
 from constants import ACTION_PHASE, BUY_PHASE, TREASURE_PHASE
-import pandas as pd
+
+PHASES = [ACTION_PHASE, TREASURE_PHASE, BUY_PHASE]
 
 
 def bot_actions(state: 'State'):
@@ -8,54 +14,118 @@ def bot_actions(state: 'State'):
     return
 
 
+class BotStateEncoder:
+    """
+    Writes the bot_state features of a player into a numpy array. The column layout is computed once per kingdom,
+    together with an index from card class to supply position, and exposed as `columns`.
+    """
+
+    def __init__(self, kingdom: Sequence[Type[Card]], dtype=np.int32):
+        self.kingdom = tuple(kingdom)
+        self.dtype = dtype
+        self.card_index: Dict[Type[Card], int] = {card: i for i, card in enumerate(self.kingdom)}
+        names = [card.__name__ for card in self.kingdom]
+        num_cards = len(names)
+
+        columns = []
+        self.hand = len(columns)
+        columns += ['num_' + name + '_in_hand' for name in names] + ['hand_size']
+        self.discard_pile = len(columns)
+        columns += ['num_' + name + '_in_discard' for name in names] + ['discard_pile_size']
+        self.draw_pile = len(columns)
+        columns += ['num_' + name + '_in_draw' for name in names] + ['draw_pile_size']
+        self.turn_attributes = len(columns)
+        columns += ['num_buys', 'num_money', 'num_actions', 'is_bot_turn']
+        self.play_area = len(columns)
+        columns += ['num_' + name + '_in_play' for name in names]
+        self.latest_played = len(columns)
+        columns += ['latest_' + name + '_in_play' for name in names]
+        self.phase = len(columns)
+        columns += PHASES
+        self.supply = len(columns)
+        columns += ['supply_size_' + name for name in names]
+        self.victory_points = len(columns)
+        columns += ['num_vp']
+
+        self.columns: List[str] = columns
+        self.num_cards = num_cards
+        self.num_features = len(columns)
+        self.phase_index = {phase: self.phase + i for i, phase in enumerate(PHASES)}
+
+    def empty(self, num_rows: int = None) -> np.ndarray:
+        """
+        Allocates an output array for one row, or for num_rows rows if given
+        """
+        shape = self.num_features if num_rows is None else (num_rows, self.num_features)
+        return np.zeros(shape, dtype=self.dtype)
+
+    def encode(self, player: 'Player', state: 'State', out: np.ndarray = None) -> np.ndarray:
+        """
+        Encodes the features of the player into out, or into a new array if out is not given
+        """
+        if out is None:
+            out = self.empty()
+        else:
+            out[:] = 0
+        num_cards = self.num_cards
+
+        hand = out[self.hand:self.hand + num_cards]
+        hand[:] = player.hand
+        out[self.hand + num_cards] = player.hand_size
+        discard_pile = out[self.discard_pile:self.discard_pile + num_cards]
+        discard_pile[:] = player.discard_pile
+        out[self.discard_pile + num_cards] = sum(player.discard_pile)
+        play_area = out[self.play_area:self.play_area + num_cards]
+        play_area[:] = player.play_area
+
+        # The draw pile is what is left of the deck
+        draw_pile = out[self.draw_pile:self.draw_pile + num_cards]
+        draw_pile[:] = player.deck
+        draw_pile -= hand
+        draw_pile -= discard_pile
+        draw_pile -= play_area
+        out[self.draw_pile + num_cards] = len(player.draw_pile)
+
+        turn_attributes = self.turn_attributes
+        out[turn_attributes] = player.buys
+        out[turn_attributes + 1] = player.money
+        out[turn_attributes + 2] = player.actions
+        out[turn_attributes + 3] = state.current_player == player
+
+        if player.latest_played is not None:
+            out[self.latest_played + player.latest_played] = 1
+
+        if state.phase in self.phase_index:
+            out[self.phase_index[state.phase]] = 1
+        out[self.supply:self.supply + num_cards] = state.supply_sizes
+        out[self.victory_points] = player.victory_points
+        return out
+
+    def encode_batch(self, players_and_states: Sequence[Tuple['Player', 'State']], out: np.ndarray = None) -> np.ndarray:
+        """
+        Encodes one row per (player, state) pair into a matrix
+        """
+        if out is None:
+            out = self.empty(len(players_and_states))
+        for row, (player, state) in zip(out, players_and_states):
+            self.encode(player, state, row)
+        return out
+
+
+@lru_cache(maxsize=None)
+def get_encoder(kingdom: Tuple[Type[Card], ...]) -> BotStateEncoder:
+    return BotStateEncoder(kingdom)
+
+
+def state_encoder(state: 'State') -> BotStateEncoder:
+    """
+    Returns the cached encoder of the kingdom of the state
+    """
+    return get_encoder(tuple(card.__class__ for card in state.supply))
+
+
 def bot_state(player, state: 'State'):
-    hand_df = cards_to_vec(player.hand, 'num_', '_in_hand', state)  # TODO: Mapping from counter to vector
-    hand_size_df = pd.DataFrame([sum(player.hand.values())], columns=['hand_size'])
-    discard_pile_df = cards_to_vec(player.discard_pile, 'num_', '_in_discard', state)
-    discard_pile_size_df = pd.DataFrame([len(player.discard_pile)], columns=['discard_pile_size'])
-    draw_pile_df = cards_to_vec(player.draw_pile, 'num_', '_in_draw', state)
-    draw_pile_size_df = pd.DataFrame([len(player.draw_pile)], columns=['draw_pile_size'])
-    num_buys_df = pd.DataFrame([player.buys], columns=['num_buys'])
-    num_coins_df = pd.DataFrame([player.money], columns=['num_money'])
-    num_actions_df = pd.DataFrame([player.actions], columns=['num_actions'])
-    num_vp_df = pd.DataFrame([player.victory_points], columns=['num_vp'])
-
-    is_bot_turn_df = pd.DataFrame([int(state.current_player == player)], columns=['is_bot_turn'])
-    played_cards_df = cards_to_vec(player.play_area, 'num_', '_in_play', state)
-
-    latest_played = [] if not player.play_area else [player.play_area[-1]]
-    latest_played_df = cards_to_vec(latest_played, 'latest_', '_in_play', state)
-
-    phases = [ACTION_PHASE, TREASURE_PHASE, BUY_PHASE]
-    phase_df = pd.DataFrame([[[state.phase].count(phase) for phase in phases]], columns=phases)
-
-    supply_pile_sizes = pd.DataFrame([[card.supply_pile_size for card in state.supply]],
-                                     columns=['supply_size_' + card.name for card in state.supply])
-
-    features = [
-        hand_df,
-        hand_size_df,
-        discard_pile_df,
-        discard_pile_size_df,
-        draw_pile_df,
-        draw_pile_size_df,
-        num_buys_df,
-        num_coins_df,
-        num_actions_df,
-        is_bot_turn_df,
-        played_cards_df,
-        latest_played_df,
-        phase_df,
-        supply_pile_sizes,
-        num_vp_df,
-    ]
-    return pd.concat(features, axis=1)
-
-
-def cards_to_vec(cards: Union[List, Counter], prefix: str, suffix: str, state: 'State'):
-    columns = [card.name for card in state.supply]
-    if isinstance(cards, list):
-        values = [cards.count(card_name) for card_name in columns]
-    else:
-        values = [cards[card_name] for card_name in columns]
-    return pd.DataFrame([values], columns=[prefix + card_name + suffix for card_name in columns])
+    encoder = state_encoder(state)
+    # pandas is only needed for this DataFrame view and is slow to import, so it is loaded on first use
+    import pandas as pd
+    return pd.DataFrame(encoder.encode(player, state)[np.newaxis], columns=encoder.columns)
@@ -1,23 +1,44 @@
-from abstract_cards import Card
 from cards import Province, Gold, Silver
-from constants import ACTION_PHASE, TREASURE_PHASE, BUY_PHASE
+from constants import ACTION_PHASE, TREASURE_PHASE, BUY_PHASE, CURSE_TYPE, TREASURE_TYPE, VICTORY_TYPE
+from decisions import DISCARD, GAIN, REACTION, TRASH, Decision
 from player import Player
-from typing import List
 
 
 class BigMoneyBot(Player):
-    def get_input(self, line: str, cards: List[Card], state: 'State') -> str:
-        if state.phase == ACTION_PHASE:
-            return list(self.hand)[0].name
-        elif state.phase == TREASURE_PHASE:
-            c = [card for card in list(self.hand) if card.is_playable(state)][0].name
-            return c
+    def choose(self, decision: Decision) -> int:
+        state = decision.state
+        kind = decision.kind
+        if kind == REACTION:
+            # Reacting (Moat) never hurts
+            return decision.indices[0]
+        elif kind == DISCARD:
+            # Discard victory cards and curses first, other cards only if forced to (cheapest first)
+            for card in decision.cards:
+                if card.types & (VICTORY_TYPE | CURSE_TYPE):
+                    return card.supply_index
+            if decision.can_skip:
+                return decision.skip
+            return min(decision.cards, key=lambda card: card.price).supply_index
+        elif kind == TRASH:
+            if decision.can_skip:
+                return decision.skip
+            # Curses first, then the cheapest card
+            return min(decision.cards, key=lambda card: (card.victory_points >= 0, card.price)).supply_index
+        elif kind == GAIN:
+            # Gain like buying: the most expensive treasure, if it is at least a Silver
+            treasures = [card for card in decision.cards if card.types & TREASURE_TYPE and card.price >= Silver.price]
+            if treasures:
+                return max(treasures, key=lambda card: card.price).supply_index
+            if decision.can_skip:
+                return decision.skip
+            return max(decision.cards, key=lambda card: card.price).supply_index
+        elif state.phase == ACTION_PHASE or state.phase == TREASURE_PHASE:
+            return decision.indices[0]
         elif state.phase == BUY_PHASE:
             if self.money > 8:
-                return Province.__name__
+                return state.card_by_class[Province].supply_index
             elif self.money > 5:
-                return Gold.__name__
+                return state.card_by_class[Gold].supply_index
             elif self.money > 2:
-                return Silver.__name__
-            else:
-                return 'Skip'
+                return state.card_by_class[Silver].supply_index
+        return decision.skip
@@ -1,26 +1,21 @@
-import random
-from typing import List
-
-from abstract_cards import Card
-from cards import Militia
-from constants import ACTION_PHASE, TREASURE_PHASE, BUY_PHASE
+from constants import ACTION_PHASE, TREASURE_PHASE, BUY_PHASE, ATTACK_TYPE
+from decisions import REACTION, Decision
 from player import Player
 
 
 class ExpensiveBot(Player):
-    def get_input(self, line: str, cards: List[Card], state: 'State') -> str:
+    def choose(self, decision: Decision) -> int:
+        state = decision.state
         if state.phase == ACTION_PHASE:
-            if cards:
-                militia = [card for card in cards if isinstance(card, Militia)]
-                if militia:
-                    return militia[0].name
-                return sorted(cards, key=lambda card: -card.price)[0].name
-            else:
-                return 'SKIP'
+            if decision.kind == REACTION:
+                return decision.skip
+            # Prefer attacks (Militia)
+            for card in decision.cards:
+                if card.types & ATTACK_TYPE:
+                    return card.supply_index
+            return max(decision.cards, key=lambda card: card.price).supply_index
         elif state.phase == TREASURE_PHASE:
-            c = [card for card in list(self.hand) if card.is_playable(state)][0].name
-            return c
+            return decision.indices[0]
         elif state.phase == BUY_PHASE:
-            card = sorted(state.affordable_cards(self.money), key=lambda card: -card.price)[0]
-            print(f'RANDOM BOUGHT {card}')
-            return card.name
+            return max(decision.cards, key=lambda card: card.price).supply_index
+        return decision.skip
@@ -0,0 +1,134 @@
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+from abstract_cards import Card
+from constants import ACTION_PHASE, BUY_PHASE, TREASURE_PHASE
+from decisions import SELECT, Decision
+from player import Player
+from .BigMoneyBot import BigMoneyBot
+
+# Process pools shared by all Monte Carlo bots, keyed by number of processes. Kept out of the bots so that the
+# bots (and states holding them) stay picklable.
+_executors: Dict[int, 'ProcessPoolExecutor'] = {}
+
+
+class MonteCarloBot(Player):
+    """
+    Answers the top-level action and buy phase prompts of its own turn by playing out the rest of the game for every
+    option (including skipping) with a cheap default policy, and picks the option with the highest mean victory point
+    margin. Ties go to the default policy's own choice, then to skipping. All other prompts are answered by the
+    default policy.
+    """
+
+    def __init__(self, name, playouts: int = 16, time_budget: float = None, processes: int = 0,
+                 policy: Type[Player] = BigMoneyBot):
+        """
+        :param name: Name of the player
+        :param playouts: Number of playouts per option
+        :param time_budget: Optional number of seconds per decision, playouts stop when it runs out
+        :param processes: Number of worker processes used for the playouts, 0 plays out in this process
+        :param policy: Player class used by all players during the playouts
+        """
+        super().__init__(name)
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.processes = processes
+        self.policy = policy
+
+    def choose(self, decision: Decision) -> int:
+        state = decision.state
+        is_turn_decision = state.current_player is self and self.resolve_area is None
+        if decision.kind == SELECT and is_turn_decision and state.phase in (ACTION_PHASE, BUY_PHASE):
+            card = self.search(decision)
+            return decision.skip if card is None else card.supply_index
+        return self.policy.choose(self, decision)
+
+    def search(self, decision: Decision) -> Optional[Card]:
+        """
+        Returns the card (or None to skip) with the highest mean victory point margin over the playouts
+        """
+        state = decision.state
+        candidates = [card.supply_index for card in decision.cards] + [None]
+        seat = state.players.index(self)
+        root = state.clone(player_class=self.policy)
+        # Playouts draw their seeds from the game's generator, so a fixed playout budget keeps games reproducible
+        seed_rng = random.Random(state.rng.getrandbits(64))
+        seeds = [seed_rng.getrandbits(64) for _ in range(self.playouts)]
+
+        if self.processes:
+            executor = _executors.get(self.processes)
+            if executor is None:
+                # Imported on first use, concurrent.futures.process loads multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                executor = _executors[self.processes] = ProcessPoolExecutor(self.processes)
+            chunk_size = math.ceil(len(seeds) / self.processes)
+            futures = [
+                executor.submit(playout_scores, root, seat, candidates, seeds[start:start + chunk_size],
+                                self.time_budget)
+                for start in range(0, len(seeds), chunk_size)
+            ]
+            totals = [0.0] * len(candidates)
+            counts = [0] * len(candidates)
+            for future in futures:
+                chunk_totals, chunk_counts = future.result()
+                for i in range(len(candidates)):
+                    totals[i] += chunk_totals[i]
+                    counts[i] += chunk_counts[i]
+        else:
+            totals, counts = playout_scores(root, seat, candidates, seeds, self.time_budget)
+
+        # Equal means, e.g. when no option changes the outcome, go to the policy's choice and then to skipping
+        policy_choice = self.policy.choose(self, decision)
+        policy_choice = None if policy_choice == decision.skip else policy_choice
+
+        def score(i: int) -> Tuple[float, bool, bool]:
+            mean = totals[i] / counts[i] if counts[i] else -math.inf
+            return mean, candidates[i] == policy_choice, candidates[i] is None
+
+        best = max(range(len(candidates)), key=score)
+        return None if candidates[best] is None else state.supply[candidates[best]]
+
+
+def playout_scores(root: 'State', seat: int, candidates: List[Optional[int]], seeds: List[int],
+                   time_budget: float = None) -> Tuple[List[float], List[int]]:
+    """
+    Plays out every candidate once per seed, interleaving the candidates so that a time budget is shared fairly.
+    Returns the summed victory point margins of the player in the seat and the number of playouts per candidate.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    totals = [0.0] * len(candidates)
+    counts = [0] * len(candidates)
+    for seed in seeds:
+        for i, candidate in enumerate(candidates):
+            totals[i] += playout(root, seat, candidate, seed)
+            counts[i] += 1
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+    return totals, counts
+
+
+def playout(root: 'State', seat: int, candidate: Optional[int], seed: int) -> float:
+    """
+    Applies the candidate (a supply position, None to skip) for the player in the seat to a copy of the root and
+    plays out the rest of the game. Returns the player's victory point margin over the best opponent.
+    """
+    state = root.clone(seed)
+    player = state.players[seat]
+    if state.phase == ACTION_PHASE:
+        if candidate is None:
+            # Skipping ends the action phase
+            state.phase = TREASURE_PHASE
+        else:
+            state.run(player.play(state.supply[candidate], state))
+    elif state.phase == BUY_PHASE:
+        if candidate is None:
+            # Skipping ends the buy phase
+            player.buys = 0
+        else:
+            player.buy(state.supply[candidate], state)
+    state.finish_game()
+
+    # Margins keep telling options apart when the player loses every playout, where win shares would all be 0
+    return player.victory_points - max(other.victory_points for other in state.players if other is not player)
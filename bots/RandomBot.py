@@ -1,22 +1,17 @@
-import random
-from typing import List
-
-from abstract_cards import Card
 from constants import ACTION_PHASE, TREASURE_PHASE, BUY_PHASE
+from decisions import REACTION, Decision
 from player import Player
 
 
 class RandomBot(Player):
-    def get_input(self, line: str, cards: List[Card], state: 'State') -> str:
+    def choose(self, decision: Decision) -> int:
+        state = decision.state
         if state.phase == ACTION_PHASE:
-            if cards:
-                return random.choice(cards).name
-            else:
-                return 'SKIP'
+            if decision.kind == REACTION:
+                return decision.skip
+            return state.rng.choice(decision.indices)
         elif state.phase == TREASURE_PHASE:
-            c = [card for card in list(self.hand) if card.is_playable(state)][0].name
-            return c
+            return decision.indices[0]
         elif state.phase == BUY_PHASE:
-            card = random.choice(state.affordable_cards(self.money))
-            print(f'RANDOM BOUGHT {card}')
-            return card.name
+            return state.rng.choice(decision.indices)
+        return decision.skip
@@ -1,3 +1,4 @@
 from .BigMoneyBot import BigMoneyBot
 from .ExpensiveBot import ExpensiveBot
-from .RandomBot import RandomBot
\ No newline at end of file
+from .RandomBot import RandomBot
+from .MonteCarloBot import MonteCarloBot
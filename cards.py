@@ -2,7 +2,9 @@ from abstract_cards import Action, Victory, Treasure, Attack, Reaction, Card
 from typing import List
 from effects import Effect
 from player import Player
-from constants import TREASURE, CURSE, BUY_PHASE
+from constants import CURSE, BUY_PHASE, TREASURE_TYPE
+from decisions import DISCARD, GAIN, TRASH
+from game_log import DEBUG
 
 
 # Victory cards
@@ -77,31 +79,34 @@ class Cellar(Action):
     price = 2
 
     def resolve(self, state: 'State'):
-        print('DISCARD CARDS')
         player = state.current_player
         num_discarded = 0
-        while player.hand:
-            card = player.prompt_select_card(list(player.hand), state)
+        while player.hand_size:
+            card = yield from player.prompt_select_card(player.cards_in_hand(), state, DISCARD)
             if not card:
                 break
             player.add_to_discard(player.remove_from_hand(card))
             num_discarded += 1
+            if player.logger.level <= DEBUG:
+                player.logger.log(DEBUG, 'discard', player=player, card=card)
         state.current_player.draw(num_discarded)
 
 
 class Laboratory(Action):
     price = 5
+    draws = 2
 
     def resolve(self, state: 'State'):
-        state.current_player.draw(2)
+        state.current_player.draw(self.draws)
         state.current_player.actions += 1
 
 
 class Market(Action):
     price = 5
+    draws = 1
 
     def resolve(self, state: 'State'):
-        state.current_player.draw(1)
+        state.current_player.draw(self.draws)
         state.current_player.actions += 1
         state.current_player.buys += 1
         state.current_player.money += 1
@@ -117,23 +122,24 @@ class Militia(Action, Attack):
     def attack(self, attacked_players: List[Player], state: 'State'):
         for player in attacked_players:
             # If other players have more than 3 cards in hand force them to discard
-            if len(player.hand) > 3:
-                player.prompt_discard(len(player.hand) - 3, state)
+            if player.hand_size > 3:
+                yield from player.prompt_discard(player.hand_size - 3, state)
 
 
 class Merchant(Action):
     price = 3
+    draws = 1
 
     def resolve(self, state: 'State'):
-        state.current_player.draw(1)
+        state.current_player.draw(self.draws)
         state.current_player.actions += 1
-        state.current_player.delayed_card_effects.append(Effect(BUY_PHASE, self.effect))
+        state.current_player.effects.schedule(Effect(BUY_PHASE, self.effect))
 
     @staticmethod
     def effect(state: 'State'):
         player = state.current_player
         # if there are any silver in the play area, add one to the players money count
-        if any(isinstance(card, Silver) for card in player.play_area):
+        if player.play_area[state.get_card(Silver).supply_index]:
             player.money += 1
 
 
@@ -143,36 +149,39 @@ class Mine(Action):
     def resolve(self, state: 'State'):
         player = state.current_player
         # Can only trash treasures in hand
-        trashable_cards = [card for card in player.hand if card.tag == TREASURE]
+        trashable_cards = [card for card in player.cards_in_hand() if card.types & TREASURE_TYPE]
         if trashable_cards:
             # Prompt for card to be gained
-            trashed_card = player.prompt_select_card(trashable_cards, state)
+            trashed_card = yield from player.prompt_select_card(trashable_cards, state, TRASH)
+            if trashed_card is None:
+                return
 
             # Move card from hand to trash
-            state.add_to_trash(player.remove_from_hand(trashed_card))
+            player.trash_from_hand(trashed_card, state)
 
             # Any treasure card that worth less than or equal to the price plus 3 of the trashed card can be gained
             gainable_cards = [
-                card for card in state.supply if
-                card.tag == TREASURE and card.price <= trashed_card.price + 3 and not card.is_supply_empty()
+                card for card in state.affordable_cards(trashed_card.price + 3) if card.types & TREASURE_TYPE
             ]
 
             # If there are any possible gainable cards, prompt player to select
             if gainable_cards:
-                gained_card = player.prompt_select_card(gainable_cards, state)
+                gained_card = yield from player.prompt_select_card(gainable_cards, state, GAIN)
 
                 # Move card from supply to player hand
-                player.add_to_hand(state.remove_from_supply(gained_card))
+                if gained_card is not None:
+                    player.gain_to_hand(gained_card, state)
 
 
 class Moat(Action, Reaction):
     price = 2
+    draws = 2
 
     def resolve(self, state: 'State'):
-        state.current_player.draw(2)
+        state.current_player.draw(self.draws)
 
-    def react(self, reacting_players: Player, attacked_players: List[Player]):
-        attacked_players.remove(reacting_players)
+    def react(self, reacting_player: Player, attacked_players: List[Player], state: 'State'):
+        attacked_players.remove(reacting_player)
 
 
 class Remodel(Action):
@@ -182,39 +191,42 @@ class Remodel(Action):
         player = state.current_player
 
         # May trash any card in hand
-        trashable_cards = list(player.hand)
+        trashable_cards = player.cards_in_hand()
         if trashable_cards:
             # Prompt for card to be gained
-            trashed_card = player.prompt_select_card(trashable_cards, state)
+            trashed_card = yield from player.prompt_select_card(trashable_cards, state, TRASH)
+            if trashed_card is None:
+                return
 
             # Move card from hand to trash
-            state.add_to_trash(player.remove_from_hand(trashed_card))
+            player.trash_from_hand(trashed_card, state)
 
             # Any card in supply worth less than or equal to the price plus 2 of the trashed card can be gained
-            gainable_cards = [
-                card for card in state.supply if card.price <= trashed_card.price + 2 and not card.is_supply_empty()
-            ]
+            gainable_cards = state.affordable_cards(trashed_card.price + 2)
 
             # If there are any possible gainable cards, prompt player to select
             if gainable_cards:
-                gained_card = player.prompt_select_card(gainable_cards, state)
+                gained_card = yield from player.prompt_select_card(gainable_cards, state, GAIN)
 
                 # Move card from supply to player hand
-                player.add_to_hand(state.remove_from_supply(gained_card))
+                if gained_card is not None:
+                    player.gain_to_hand(gained_card, state)
 
 
 class Smithy(Action):
     price = 4
+    draws = 3
 
     def resolve(self, state: 'State'):
-        state.current_player.draw(3)
+        state.current_player.draw(self.draws)
 
 
 class Village(Action):
     price = 3
+    draws = 1
 
     def resolve(self, state: 'State'):
-        state.current_player.draw(1)
+        state.current_player.draw(self.draws)
         state.current_player.actions += 2
 
 
@@ -223,5 +235,6 @@ class Workshop(Action):
 
     def resolve(self, state: 'State'):
         player = state.current_player
-        card = player.prompt_select_card(state.affordable_cards(4), state)
-        player.gain(card, state)
+        card = yield from player.prompt_select_card(state.affordable_cards(4), state, GAIN)
+        if card is not None:
+            player.gain(card, state)
@@ -7,8 +7,29 @@ TREASURE = 'treasure'
 VICTORY = 'victory'
 CURSE = 'curse'
 
+# Type flags, combined into the types bitmask of every card class
+ACTION_TYPE = 1
+ATTACK_TYPE = 2
+REACTION_TYPE = 4
+TREASURE_TYPE = 8
+VICTORY_TYPE = 16
+CURSE_TYPE = 32
+TYPE_FLAGS = {
+    ACTION: ACTION_TYPE,
+    ATTACK: ATTACK_TYPE,
+    REACTION: REACTION_TYPE,
+    TREASURE: TREASURE_TYPE,
+    VICTORY: VICTORY_TYPE,
+    CURSE: CURSE_TYPE,
+}
+
 # Phases
 ACTION_PHASE = 'ACTION'
 TREASURE_PHASE = 'TREASURE'
 BUY_PHASE = 'BUY'
 
+# Game end conditions
+PROVINCE_PILE_EMPTY = 'PROVINCE_PILE_EMPTY'
+SUPPLY_PILES_EMPTY = 'SUPPLY_PILES_EMPTY'
+TURN_LIMIT_REACHED = 'TURN_LIMIT_REACHED'
+
@@ -0,0 +1,120 @@
+from typing import List, Optional, Union
+
+from abstract_cards import Card
+
+# Kinds of decisions
+SELECT = 'select'
+REACTION = 'reaction'
+DISCARD = 'discard'
+TRASH = 'trash'
+GAIN = 'gain'
+
+# Decisions that can be answered by skipping by default (for reactions, skipping means not reacting). Optional
+# discards, trashes and gains made while resolving a card, e.g. Remodel's, are skippable as well.
+SKIPPABLE = {SELECT, REACTION}
+
+
+def card_sort(card: Card) -> List[str]:
+    return [card.tag, card.name]
+
+
+class Decision:
+    """
+    A prompt waiting for an answer. The game coroutines (State.game, Player.play, the prompt methods and card effects
+    that prompt) yield decisions and are resumed with the answer: the chosen card or None to skip, or for reactions
+    whether the player reacts. State.run answers them one at a time with Player.decide; lockstep.run_lockstep
+    answers the decisions of many games at once.
+
+    Answers are encoded as supply positions: the legal answers are the positions of the cards (indices, or mask as a
+    bitmask) plus skip = len(supply) if the decision can be skipped. For reactions, any position but skip reacts.
+    """
+    __slots__ = ('player', 'state', 'kind', 'prompt', 'cards', 'can_skip')
+
+    def __init__(self, player: 'Player', state: 'State', kind: str, prompt: str, cards: List[Card],
+                 can_skip: bool = None):
+        """
+        :param player: Deciding player
+        :param state: Game the decision is made in
+        :param kind: Kind of decision, e.g. SELECT
+        :param prompt: Prompt shown to human players, {cards} is replaced by the cards to choose from
+        :param cards: Cards to choose from, the reaction card for reactions
+        :param can_skip: Whether the decision can be skipped, defaults to whether the kind is in SKIPPABLE
+        """
+        self.player = player
+        self.state = state
+        self.kind = kind
+        self.prompt = prompt
+        self.cards = cards
+        self.can_skip = kind in SKIPPABLE if can_skip is None else can_skip
+
+    @property
+    def line(self) -> str:
+        """
+        The prompt with the cards sorted by type and name. Only built when asked for, bots never need it.
+        """
+        return self.prompt.format(cards=sorted(self.cards, key=card_sort))
+
+    @property
+    def skip(self) -> int:
+        """
+        Index answering the decision by skipping (or not reacting)
+        """
+        return len(self.state.supply)
+
+    @property
+    def indices(self) -> List[int]:
+        """
+        Supply positions of the cards to choose from
+        """
+        return [card.supply_index for card in self.cards]
+
+    @property
+    def mask(self) -> int:
+        """
+        Legal answers as a bitmask, bit i set for every legal supply position i and bit skip if the decision can be
+        skipped
+        """
+        mask = 1 << self.skip if self.can_skip else 0
+        for card in self.cards:
+            mask |= 1 << card.supply_index
+        return mask
+
+    def index_of(self, answer: str) -> int:
+        """
+        Converts an answer of get_input (a card name, 'Y' or 'N' for reactions) to an index. Anything that is not a
+        card name, e.g. 'Skip', skips.
+        """
+        if self.kind == REACTION:
+            return self.cards[0].supply_index if answer == 'Y' else self.skip
+        card = self.state.card_by_name.get(answer)
+        return self.skip if card is None else card.supply_index
+
+    def parse(self, answer: str) -> Union[Optional[Card], bool]:
+        """
+        Converts an answer of get_input to the answer of the decision
+        """
+        return self.from_index(self.index_of(answer))
+
+    def from_index(self, index: int) -> Union[Optional[Card], bool]:
+        """
+        Converts a supply position, or skip, to the answer of the decision. Positions of cards that cannot be chosen
+        skip, like unknown card names do.
+        """
+        supply = self.state.supply
+        if self.kind == REACTION:
+            return index != len(supply)
+        if 0 <= index < len(supply):
+            card = supply[index]
+            if card in self.cards:
+                return card
+        return None
+
+    def legal_mask(self, out):
+        """
+        Sets out[i] for every legal supply position i, and out[skip] if the decision can be skipped. out is a boolean
+        array (or list) of len(supply) + 1.
+        """
+        out[:] = [False] * len(out)
+        for card in self.cards:
+            out[card.supply_index] = True
+        out[len(self.state.supply)] = self.can_skip
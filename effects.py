@@ -1,15 +1,109 @@
-from abc import abstractmethod
-from typing import Callable
+"""
+Delayed card effects. An effect resolves when its trigger phase starts, e.g. Merchant's bonus at the start of the buy
+phase. Every player keeps its pending effects in an EffectScheduler, bucketed by trigger phase, so a phase boundary
+only touches the effects it triggers.
+"""
+from typing import Callable, Dict, List
+
+# Lifetimes
+THIS_TURN = 'THIS_TURN'
+NEXT_TURN = 'NEXT_TURN'
+WHILE_IN_PLAY = 'WHILE_IN_PLAY'
 
 
 class Effect:
+    """
+    Resolves once when its trigger phase starts. Effects with lifetime NEXT_TURN trigger in the owner's next turn
+    instead, effects with lifetime WHILE_IN_PLAY trigger every turn for as long as their source card stays in play.
+    """
 
-    def __init__(self, trigger_phase: str, resolve: Callable[['State'], None]):
+    def __init__(self, trigger_phase: str, resolve: Callable[['State'], None], lifetime: str = THIS_TURN,
+                 source: 'Card' = None):
+        """
+        :param trigger_phase: Phase at whose start the effect resolves
+        :param resolve: Function resolving the effect
+        :param lifetime: THIS_TURN, NEXT_TURN or WHILE_IN_PLAY
+        :param source: Card creating the effect, required for WHILE_IN_PLAY
+        """
         self.trigger_phase = trigger_phase
         self._resolve = resolve
-        self.has_triggered = False
+        self.lifetime = lifetime
+        self.source = source
 
     def resolve(self, state: 'State'):
-        if state.phase == self.trigger_phase:
-            self._resolve(state)
-            self.has_triggered = True
+        self._resolve(state)
+
+
+class EffectScheduler:
+    """
+    Pending effects of a player. Effects are never scanned: firing a phase pops its bucket and cleanup drops the
+    buckets of the turn.
+    """
+
+    def __init__(self):
+        # Effects triggering this turn by trigger phase, effects armed at the end of this turn and effects to re-arm
+        # every turn while their source is in play
+        self._this_turn: Dict[str, List[Effect]] = {}
+        self._next_turn: List[Effect] = []
+        self._while_in_play: List[Effect] = []
+
+    def __len__(self):
+        return sum(len(effects) for effects in self._this_turn.values()) + len(self._next_turn)
+
+    def schedule(self, effect: Effect):
+        if effect.lifetime == NEXT_TURN:
+            self._next_turn.append(effect)
+            return
+        if effect.lifetime == WHILE_IN_PLAY:
+            self._while_in_play.append(effect)
+        self._this_turn.setdefault(effect.trigger_phase, []).append(effect)
+
+    def fire(self, phase: str, state: 'State'):
+        """
+        Resolves the effects triggered by the start of the phase
+        """
+        effects = self._this_turn.pop(phase, None)
+        if effects:
+            for effect in effects:
+                effect.resolve(state)
+
+    def end_turn(self, player: 'Player'):
+        """
+        Expires the effects of the turn and arms those of the next turn. Called after cleanup, so only cards that stay
+        in play keep their WHILE_IN_PLAY effects.
+        """
+        if self._this_turn:
+            self._this_turn = {}
+        if self._while_in_play:
+            play_area = player.play_area
+            self._while_in_play = [effect for effect in self._while_in_play if play_area[effect.source.supply_index]]
+            for effect in self._while_in_play:
+                self._this_turn.setdefault(effect.trigger_phase, []).append(effect)
+        if self._next_turn:
+            for effect in self._next_turn:
+                self._this_turn.setdefault(effect.trigger_phase, []).append(effect)
+            self._next_turn = []
+
+    def clear(self):
+        self._this_turn = {}
+        self._next_turn = []
+        self._while_in_play = []
+
+    def clone(self) -> 'EffectScheduler':
+        # Effects are immutable, only the buckets are copied
+        scheduler = EffectScheduler.__new__(EffectScheduler)
+        scheduler.restore(self.snapshot())
+        return scheduler
+
+    def snapshot(self) -> tuple:
+        return (
+            tuple((phase, tuple(effects)) for phase, effects in self._this_turn.items()),
+            tuple(self._next_turn),
+            tuple(self._while_in_play),
+        )
+
+    def restore(self, snapshot: tuple):
+        this_turn, next_turn, while_in_play = snapshot
+        self._this_turn = {phase: list(effects) for phase, effects in this_turn}
+        self._next_turn = list(next_turn)
+        self._while_in_play = list(while_in_play)
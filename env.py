@@ -0,0 +1,202 @@
+"""
+Reinforcement learning environments in the style of Gym. One seat of the game is played by the agent, the other seats
+by bots answering in place. Observations are the bot_state features of the agent (see bot.BotStateEncoder), actions
+are supply positions with len(supply) for skipping, as in lockstep.BatchPolicy, and the legal actions of the pending
+decision are given as a boolean mask in info['action_mask'].
+
+The reward of a step is the change in the agent's lead in victory points over the best opponent, so the rewards of a
+game add up to the final margin.
+
+    env = VectorEnv(64, opponents=(BigMoneyBot,), seed=0)
+    observations, info = env.reset()
+    observations, rewards, terminated, truncated, info = env.step(actions)
+"""
+from typing import Dict, Generator, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from abstract_cards import Card
+from bot import state_encoder
+from bots import BigMoneyBot
+from constants import TURN_LIMIT_REACHED
+from decisions import Decision
+from player import Player
+from recommended_kingdoms import FIRST_GAME, initialize_kingdom
+from state import State
+
+
+class DominionEnv:
+    """
+    A single game. Games are played on one State that is reset in place, so resetting does not allocate.
+    """
+
+    def __init__(self, opponents: Sequence[Type[Player]] = (BigMoneyBot,), kingdom: List[Type[Card]] = FIRST_GAME,
+                 max_turn_number: int = 25, seed: int = None, seat: int = 0):
+        """
+        :param opponents: Bot classes playing the other seats
+        :param kingdom: Card classes making up the supply
+        :param max_turn_number: Turn after which games are ended (and truncated)
+        :param seed: Seed of the first game, the following games are seeded seed + seed_stride, ... when reset is
+            called without a seed
+        :param seat: Seat of the agent
+        """
+        self.agent = Player('Agent')
+        players = [opponent(f'{opponent.__name__}{n + 1}') for n, opponent in enumerate(opponents)]
+        players.insert(seat, self.agent)
+        self.state = State(players, initialize_kingdom(kingdom, len(players)), max_turn_number, seed)
+        self.encoder = state_encoder(self.state)
+        self.num_actions = len(self.state.supply) + 1
+        self.observation_size = self.encoder.num_features
+        self.seed_stride = 1
+        self._next_seed = seed
+        self._coroutine: Optional[Generator] = None
+        self._decision: Optional[Decision] = None
+        self._margin = 0
+
+    @property
+    def decision(self) -> Optional[Decision]:
+        """
+        The decision the agent has to make, None once the game has ended
+        """
+        return self._decision
+
+    def reset(self, seed: int = None, observation: np.ndarray = None,
+              action_mask: np.ndarray = None) -> Tuple[np.ndarray, Dict]:
+        """
+        Starts a new game and plays it until the agent has to decide
+        :param seed: Seed of the game, defaults to the next seed of the environment
+        :param observation: Array the observation is written into, e.g. a row of a batch
+        :param action_mask: Array the action mask is written into
+        :return: observation, info
+        """
+        if seed is None and self._next_seed is not None:
+            seed = self._next_seed
+            self._next_seed += self.seed_stride
+        elif seed is not None:
+            self._next_seed = seed + self.seed_stride
+        self.state.reset(seed)
+        self._coroutine = self.state.game()
+        self._margin = self._victory_point_margin()
+        self._decision = self._advance(None)
+        return self._observe(observation, action_mask)
+
+    def step(self, action: int, observation: np.ndarray = None,
+             action_mask: np.ndarray = None) -> Tuple[np.ndarray, float, bool, bool, Dict]:
+        """
+        Answers the pending decision with a supply position (len(supply) to skip) and plays until the agent has to
+        decide again or the game ends
+        :return: observation, reward, terminated, truncated, info
+        """
+        decision = self._decision
+        if decision is None:
+            raise RuntimeError('The game has ended, call reset to start a new one')
+        mask = np.zeros(self.num_actions, dtype=bool)
+        decision.legal_mask(mask)
+        if not 0 <= action < self.num_actions or not mask[action]:
+            raise ValueError(f'{action} is not a legal action')
+        self._decision = self._advance(decision.from_index(action))
+
+        margin = self._victory_point_margin()
+        reward = float(margin - self._margin)
+        self._margin = margin
+        observation, info = self._observe(observation, action_mask)
+        done = self._decision is None
+        truncated = done and self.state.game_end_reason() == TURN_LIMIT_REACHED
+        return observation, reward, done and not truncated, truncated, info
+
+    def _advance(self, answer) -> Optional[Decision]:
+        # Sends the answer and answers the decisions of the bots until the agent decides or the game ends
+        agent = self.agent
+        coroutine = self._coroutine
+        try:
+            decision = coroutine.send(answer)
+            while decision.player is not agent:
+                decision = coroutine.send(decision.player.decide(decision))
+            return decision
+        except StopIteration:
+            return None
+
+    def _victory_point_margin(self) -> int:
+        agent = self.agent
+        return agent.victory_points - max(player.victory_points for player in self.state.players if player is not agent)
+
+    def _observe(self, observation: np.ndarray = None, action_mask: np.ndarray = None) -> Tuple[np.ndarray, Dict]:
+        observation = self.encoder.encode(self.agent, self.state, observation)
+        if action_mask is None:
+            action_mask = np.zeros(self.num_actions, dtype=bool)
+        if self._decision is None:
+            action_mask[:] = False
+            kind = None
+        else:
+            self._decision.legal_mask(action_mask)
+            kind = self._decision.kind
+        return observation, {'action_mask': action_mask, 'kind': kind}
+
+
+class VectorEnv:
+    """
+    num_envs independent games stepped together, with observations, rewards and masks stacked into arrays. A game
+    that ends is reset right away: its row then holds the first observation of the next game, and the last
+    observation of the finished game is in info['final_observation'].
+    The returned arrays are reused by the next call, copy them to keep them.
+    """
+
+    def __init__(self, num_envs: int, opponents: Sequence[Type[Player]] = (BigMoneyBot,),
+                 kingdom: List[Type[Card]] = FIRST_GAME, max_turn_number: int = 25, seed: int = None, seat: int = 0):
+        """
+        :param seed: Game i is seeded seed + i, the following games of environment i seed + i + num_envs, ...
+        """
+        self.envs = [
+            DominionEnv(opponents, kingdom, max_turn_number, None if seed is None else seed + i, seat)
+            for i in range(num_envs)
+        ]
+        for env in self.envs:
+            env.seed_stride = num_envs
+        self.num_envs = num_envs
+        self.num_actions = self.envs[0].num_actions
+        self.observation_size = self.envs[0].observation_size
+        self.encoder = self.envs[0].encoder
+
+        # Output arrays, reused by every call
+        self.observations = self.encoder.empty(num_envs)
+        self.action_masks = np.zeros((num_envs, self.num_actions), dtype=bool)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.terminated = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+        self.final_observations = self.encoder.empty(num_envs)
+
+    def reset(self, seed: int = None) -> Tuple[np.ndarray, Dict]:
+        """
+        Starts a new game in every environment
+        :param seed: Reseeds game i with seed + i
+        :return: observations (num_envs x features), info with the action masks (num_envs x actions)
+        """
+        for i, env in enumerate(self.envs):
+            env.reset(None if seed is None else seed + i, self.observations[i], self.action_masks[i])
+        return self.observations, {'action_mask': self.action_masks}
+
+    def step(self, actions: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """
+        Steps every environment with its action
+        :return: observations, rewards, terminated, truncated, info with the action masks, and the final observations
+            of the games that ended in this step
+        """
+        observations = self.observations
+        action_masks = self.action_masks
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            _, self.rewards[i], self.terminated[i], self.truncated[i], _ = env.step(
+                int(action), observations[i], action_masks[i]
+            )
+        done = self.terminated | self.truncated
+        self.final_observations[done] = observations[done]
+        for i in np.flatnonzero(done):
+            self.envs[i].reset(None, observations[i], action_masks[i])
+        return observations, self.rewards, self.terminated, self.truncated, {
+            'action_mask': action_masks,
+            'final_observation': self.final_observations,
+            'done': done,
+        }
+
+    @property
+    def decisions(self) -> List[Optional[Decision]]:
+        return [env.decision for env in self.envs]
@@ -0,0 +1,121 @@
+import json
+import sys
+from abc import ABC, abstractmethod
+from typing import IO, Dict, List, Optional
+
+# Levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+DISABLED = 100
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING'}
+
+
+class Sink(ABC):
+    """
+    Base class for destinations of game events
+    """
+    # Level of the sink, None uses the level of the logger
+    level: Optional[int] = None
+
+    @abstractmethod
+    def write(self, level: int, event: str, fields: Dict):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullSink(Sink):
+    """
+    Drops every event
+    """
+
+    def write(self, level: int, event: str, fields: Dict):
+        pass
+
+
+class TextSink(Sink):
+    """
+    Writes events as human readable lines
+    """
+    TEMPLATES = {
+        'game_start': 'GAME START (seed {seed})',
+        'turn': 'TURN {turn_number}',
+        'phase': "PLAYER {player}'S {phase} PHASE",
+        'hand': '{player} HAND: {cards}',
+        'draw': '{player} drew {card}',
+        'decision': '{player} selected {card}',
+        'play': '{player} played {card}',
+        'buy': '{player} bought {card}',
+        'gain': '{player} gained {card}',
+        'discard': '{player} discarded {card}',
+        'trash': '{player} trashed {card}',
+        'gain_to_hand': '{player} gained {card} to hand',
+        'cleanup': '{player} cleaned up',
+        'snapshot': 'SUPPLY: {supply_sizes}',
+        'game_end': 'GAME END ({reason}) after {turn_number} turns, VP: {victory_points}',
+    }
+
+    def __init__(self, stream: IO = None):
+        self.stream = stream or sys.stdout
+
+    def write(self, level: int, event: str, fields: Dict):
+        template = self.TEMPLATES.get(event)
+        if template is None:
+            line = ' '.join([event] + [f'{key}={value}' for key, value in fields.items()])
+        else:
+            line = template.format(**fields)
+        self.stream.write(line + '\n')
+
+
+class JsonLinesSink(Sink):
+    """
+    Writes every event as a JSON object on its own line. Players and cards are written by name.
+    """
+
+    def __init__(self, stream: IO):
+        self.stream = stream
+
+    def write(self, level: int, event: str, fields: Dict):
+        record = {'level': LEVEL_NAMES.get(level, level), 'event': event}
+        record.update(fields)
+        self.stream.write(json.dumps(record, default=str) + '\n')
+
+
+class GameLogger:
+    """
+    Emits game events to its sinks. Events below the level are dropped. A logger without sinks is disabled: its level
+    is DISABLED, so hot paths can skip building events with a single comparison, e.g.
+        if logger.level <= DEBUG:
+            logger.log(DEBUG, 'draw', player=player, card=card)
+    Fields are passed as objects (players, cards) and only formatted by the sinks that write them. Sinks with their
+    own level (e.g. a replay writer that needs every draw) only receive the events at or above it.
+    """
+
+    def __init__(self, sinks: List[Sink] = (), level: int = INFO):
+        self.default_level = level
+        self.sinks = [sink for sink in sinks if not isinstance(sink, NullSink)]
+        self.sink_levels = [level if sink.level is None else sink.level for sink in self.sinks]
+        self.level = min(self.sink_levels, default=DISABLED)
+
+    def log(self, level: int, event: str, **fields):
+        if level < self.level:
+            return
+        for sink, sink_level in zip(self.sinks, self.sink_levels):
+            if level >= sink_level:
+                sink.write(level, event, fields)
+
+    def with_sink(self, sink: Sink) -> 'GameLogger':
+        """
+        Returns a new logger writing to the sinks of this logger and the given sink
+        """
+        return GameLogger(self.sinks + [sink], self.default_level)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+NULL_LOGGER = GameLogger()
@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, Generator, List, Optional, Sequence, Type, Union
+
+import numpy as np
+
+from abstract_cards import Card
+from bot import state_encoder
+from decisions import Decision
+from player import Player
+from recommended_kingdoms import FIRST_GAME, initialize_kingdom
+from simulation import GameResult, game_result
+from state import State
+
+
+class BatchPolicy(ABC):
+    """
+    Makes the decisions of many games in one call. Answers are supply positions; the extra position len(supply) skips
+    (or declines to react).
+    """
+
+    @abstractmethod
+    def decide(self, features: np.ndarray, masks: np.ndarray, decisions: List[Decision]) -> np.ndarray:
+        """
+        :param features: bot_state features of the deciding players (decisions x features)
+        :param masks: Legal answers (decisions x supply positions + 1), the last column is skip
+        :param decisions: The pending decisions, e.g. to look at their kind
+        :return: Answer per decision
+        """
+        pass
+
+
+class RandomPolicy(BatchPolicy):
+    """
+    Picks a uniformly random legal answer
+    """
+
+    def __init__(self, seed: int = None):
+        self.rng = np.random.default_rng(seed)
+
+    def decide(self, features: np.ndarray, masks: np.ndarray, decisions: List[Decision]) -> np.ndarray:
+        scores = self.rng.random(masks.shape)
+        scores[~masks] = -1
+        return scores.argmax(axis=1)
+
+
+class BatchPlayer(Player):
+    """
+    Player whose decisions are made by a BatchPolicy. In run_lockstep its decisions are batched across games; in a
+    regular game every decision is a batch of one.
+    """
+
+    def __init__(self, name, policy: BatchPolicy):
+        super().__init__(name)
+        self.policy = policy
+
+    def choose(self, decision: Decision) -> int:
+        state = decision.state
+        features = state_encoder(state).encode(self, state)[np.newaxis]
+        mask = np.zeros((1, len(state.supply) + 1), dtype=bool)
+        decision.legal_mask(mask[0])
+        return int(self.policy.decide(features, mask, [decision])[0])
+
+
+def run_lockstep(num_games: int, seats: Sequence[Union[Type[Player], BatchPolicy]],
+                 kingdom: List[Type[Card]] = FIRST_GAME, seed: int = None,
+                 max_turn_number: int = 25) -> List[GameResult]:
+    """
+    Plays num_games games in lockstep. Every game runs until a BatchPlayer has to decide; the pending decisions are
+    then answered in one decide call per policy and the games continue. Decisions of regular bots are answered
+    in place with Player.decide. Game i is seeded with seed + i.
+    :param seats: Per seat a Player class, or a BatchPolicy shared by that seat in all games
+    """
+    states = []
+    coroutines = []
+    for i in range(num_games):
+        players = [
+            BatchPlayer(f'{seat.__class__.__name__}{n + 1}', seat) if isinstance(seat, BatchPolicy)
+            else seat(f'{seat.__name__}{n + 1}')
+            for n, seat in enumerate(seats)
+        ]
+        state = State(players, initialize_kingdom(kingdom, len(players)), max_turn_number,
+                      None if seed is None else seed + i)
+        states.append(state)
+        coroutines.append(state.game())
+
+    pending: List[Optional[Decision]] = [_advance(coroutine, None) for coroutine in coroutines]
+    encoder = state_encoder(states[0]) if states else None
+    while True:
+        games_by_policy: Dict[BatchPolicy, List[int]] = defaultdict(list)
+        for game, decision in enumerate(pending):
+            if decision is not None:
+                games_by_policy[decision.player.policy].append(game)
+        if not games_by_policy:
+            break
+
+        for policy, games in games_by_policy.items():
+            decisions = [pending[game] for game in games]
+            features = encoder.empty(len(games))
+            masks = np.zeros((len(games), encoder.num_cards + 1), dtype=bool)
+            for row, decision in enumerate(decisions):
+                encoder.encode(decision.player, decision.state, features[row])
+                decision.legal_mask(masks[row])
+            answers = policy.decide(features, masks, decisions)
+            for row, (game, decision) in enumerate(zip(games, decisions)):
+                answer = int(answers[row])
+                if not masks[row, answer]:
+                    raise ValueError(f'{policy.__class__.__name__} answered {answer}, which is not a legal answer')
+                pending[game] = _advance(coroutines[game], decision.from_index(answer))
+
+    return [game_result(state, None if seed is None else seed + i) for i, state in enumerate(states)]
+
+
+def _advance(coroutine: Generator, answer) -> Optional[Decision]:
+    # Sends the answer and answers the decisions of regular bots until a BatchPlayer decides or the game ends
+    try:
+        decision = coroutine.send(answer)
+        while not isinstance(decision.player, BatchPlayer):
+            decision = coroutine.send(decision.player.decide(decision))
+        return decision
+    except StopIteration:
+        return None
@@ -1,10 +1,15 @@
-from random import sample
+import random
 import typing
-from collections import Counter
-from abstract_cards import Card, Victory, Attack, Reaction, Action
+from time import perf_counter
+from abstract_cards import Card
+from constants import ATTACK_TYPE, REACTION_TYPE
+from decisions import DISCARD, GAIN, REACTION, SELECT, TRASH, Decision
+from game_log import DEBUG, INFO, NULL_LOGGER
+from profiling import ATTACK, DECISION, RESOLVE
+from profiling import REACTION as REACTION_TIMING
 
 # TODO: Try making list of cards into deques
-from effects import Effect
+from effects import EffectScheduler
 
 
 class CardNotInHand(Exception):
@@ -17,12 +22,22 @@ class Player:
     def __init__(self, name):
         self.name = name
 
-        # Card areas
-        self.draw_pile: typing.List[Card] = []
-        self.hand: typing.Counter[Card, int] = Counter()
-        self.discard_pile: typing.List[Card] = []
-        self.play_area: typing.List[Card] = []
+        # Random number generator and logger, replaced by the game's when the player joins a State
+        self.rng = random.Random()
+        self.logger = NULL_LOGGER
+
+        # Card areas. All areas are indexed by supply position: hand, discard pile and play area hold the number of
+        # copies of each card, the draw pile holds supply positions in no particular order (draw picks a random card, so
+        # the pile is shuffled lazily) and deck holds the number of copies of each card the player owns across all areas.
+        self.supply: typing.List[Card] = []
+        self.draw_pile: typing.List[int] = []
+        self.hand: typing.List[int] = []
+        self.discard_pile: typing.List[int] = []
+        self.play_area: typing.List[int] = []
+        self.deck: typing.List[int] = []
+        self.latest_played: typing.Optional[int] = None
         self.resolve_area = None
+        self._victory_points: typing.List[int] = []
 
         # Turn attributes
         self.money: int = 0
@@ -30,43 +45,173 @@ class Player:
         self.actions: int = 1
 
         # Effects
-        self.delayed_card_effects: typing.List[Effect] = []
+        self.effects = EffectScheduler()
 
-    @property
-    def deck(self) -> typing.List[Card]:
-        return self.draw_pile + list(self.hand.elements()) + self.discard_pile
+    def setup_zones(self, supply: typing.List[Card], starting_cards: typing.Sequence[int]):
+        """
+        Creates empty card areas for the supply and puts the starting cards into the draw pile
+        :param supply: Supply of the game, in supply position order
+        :param starting_cards: Supply positions of the starting cards
+        """
+        num_cards = len(supply)
+        self.supply = supply
+        self._no_cards = (0,) * num_cards
+        self.hand = [0] * num_cards
+        self.discard_pile = [0] * num_cards
+        self.play_area = [0] * num_cards
+        self.deck = [0] * num_cards
+        self.draw_pile = []
+        self._victory_points = [card.victory_points for card in supply]
+        self.reset_zones(starting_cards)
+
+    def reset_zones(self, starting_cards: typing.Sequence[int]):
+        """
+        Empties all card areas in place, puts the starting cards into the draw pile and resets the turn attributes
+        and effects, e.g. to reuse the player for a new game with the same supply
+        """
+        self.hand[:] = self._no_cards
+        self.discard_pile[:] = self._no_cards
+        self.play_area[:] = self._no_cards
+        self.deck[:] = self._no_cards
+        for index in starting_cards:
+            self.deck[index] += 1
+        self.draw_pile[:] = starting_cards
+        self.latest_played = None
+        self.resolve_area = None
+        self.effects.clear()
+        self.reset_turn_attributes()
+
+    def clone(self, rng: random.Random, player_class: typing.Type['Player'] = None) -> 'Player':
+        """
+        Returns a copy of the player with its own card areas and effects, drawing from the given generator
+        :param rng: Random number generator of the copy
+        :param player_class: Class of the copy, defaults to the class of the player
+        """
+        player_class = player_class or self.__class__
+        player = player_class.__new__(player_class)
+        player.__dict__.update(self.__dict__)
+        player.rng = rng
+        player.draw_pile = self.draw_pile[:]
+        player.hand = self.hand[:]
+        player.discard_pile = self.discard_pile[:]
+        player.play_area = self.play_area[:]
+        player.deck = self.deck[:]
+        player.effects = self.effects.clone()
+        return player
+
+    def snapshot(self) -> tuple:
+        """
+        Returns the card areas, turn attributes and effects of the player as a tuple of flat values
+        """
+        return (
+            tuple(self.draw_pile),
+            tuple(self.hand),
+            tuple(self.discard_pile),
+            tuple(self.play_area),
+            tuple(self.deck),
+            self.latest_played,
+            self.resolve_area,
+            self.money,
+            self.buys,
+            self.actions,
+            self.effects.snapshot(),
+        )
+
+    def restore(self, snapshot: tuple):
+        """
+        Restores the player in place to a snapshot taken from this player
+        """
+        (draw_pile, hand, discard_pile, play_area, deck, self.latest_played, self.resolve_area, self.money, self.buys,
+         self.actions, effects) = snapshot
+        self.draw_pile[:] = draw_pile
+        self.hand[:] = hand
+        self.discard_pile[:] = discard_pile
+        self.play_area[:] = play_area
+        self.deck[:] = deck
+        self.effects.restore(effects)
 
     @property
     def victory_points(self) -> int:
-        return sum(card.victory_points for card in self.deck if hasattr(card, 'victory_points'))
+        victory_points = self._victory_points
+        return sum(victory_points[index] * count for index, count in enumerate(self.deck) if count)
+
+    @property
+    def hand_size(self) -> int:
+        return sum(self.hand)
+
+    def cards(self, counts: typing.List[int]) -> typing.List[Card]:
+        """
+        Expands a card area of counts into a list of cards, e.g. player.cards(player.deck)
+        """
+        supply = self.supply
+        return [supply[index] for index, count in enumerate(counts) for _ in range(count)]
+
+    def cards_in_hand(self) -> typing.List[Card]:
+        """
+        Returns the distinct cards in hand
+        """
+        supply = self.supply
+        return [supply[index] for index, count in enumerate(self.hand) if count]
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return self.name
 
     def play(self, card: Card, state: 'State'):
+        """
+        Coroutine that plays the card, yielding the decisions made while resolving it
+        """
         if card.is_playable(state):
+            if self.logger.level <= INFO:
+                self.logger.log(INFO, 'play', player=self, card=card)
+
             # Remove card from hand
             self.remove_from_hand(card)
 
             # Add card to play area
-            self.play_area.append(card)
+            self.play_area[card.supply_index] += 1
+            self.latest_played = card.supply_index
             self.resolve_area = card
 
-            # Resolve card effect
-            card.resolve(state)
+            # Resolve card effect. Cards that prompt resolve as coroutines yielding their decisions.
+            stats = state.stats
+            if stats is not None:
+                start = perf_counter()
+            resolution = card.resolve(state)
+            if resolution is not None:
+                yield from resolution
+            if stats is not None:
+                stats.add(RESOLVE, card.name, perf_counter() - start)
 
             # Resolve attack and reacts
-            if isinstance(card, Attack):
+            if card.types & ATTACK_TYPE:
+                if stats is not None:
+                    start = perf_counter()
                 # Get targeted players
                 attacked_players = [player for player in state.players if player != self]
 
                 # Resolve any reactions to the attack
                 for player in attacked_players:
-                    reaction_cards = [card for card in list(player.hand) if isinstance(card, Reaction)]
+                    reaction_cards = [card for card in player.cards_in_hand() if card.types & REACTION_TYPE]
                     for reaction_card in reaction_cards:
-                        has_reacted = player.prompt_reaction(reaction_card, state)
+                        has_reacted = yield from player.prompt_reaction(reaction_card, state)
                         if has_reacted:
-                            reaction_card.react(player, attacked_players, state)
+                            if stats is not None:
+                                reaction_start = perf_counter()
+                            reaction = reaction_card.react(player, attacked_players, state)
+                            if reaction is not None:
+                                yield from reaction
+                            if stats is not None:
+                                stats.add(REACTION_TIMING, reaction_card.name, perf_counter() - reaction_start)
 
                 # Resolve attack
-                card.attack(attacked_players, state)
+                attack = card.attack(attacked_players, state)
+                if attack is not None:
+                    yield from attack
+                if stats is not None:
+                    stats.add(ATTACK, card.name, perf_counter() - start)
 
             # Reduce number of actions
             self.actions -= 1
@@ -74,159 +219,192 @@ class Player:
 
 
     def has_playable_cards_in_hand(self, state: 'State'):
-        return any(card.is_playable(state) for card in self.hand)
+        hand = self.hand
+        return any(
+            hand[card.supply_index] and card.is_playable(state) for card in state.playable_by_phase.get(state.phase, ())
+        )
 
     def playable_cards(self, state: 'State'):
-        return [card for card in self.hand if card.is_playable(state)]
+        hand = self.hand
+        return [
+            card for card in state.playable_by_phase.get(state.phase, ())
+            if hand[card.supply_index] and card.is_playable(state)
+        ]
 
     def add_to_hand(self, card: Card):
-        self.hand[card] += 1
+        self.hand[card.supply_index] += 1
 
     def add_to_discard(self, card: Card):
-        self.discard_pile.append(card)
+        self.discard_pile[card.supply_index] += 1
 
     def cleanup(self):
-        # Cleanup hand
-        for card in list(self.hand.elements()):
-            self.discard_pile.append(self.remove_from_hand(card))
-
-        # Cleanup play area
-        self.discard_pile.extend(self.play_area)
-        self.play_area = []
+        # Move hand and play area to the discard pile
+        hand = self.hand
+        discard_pile = self.discard_pile
+        play_area = self.play_area
+        for index in range(len(discard_pile)):
+            discard_pile[index] += hand[index] + play_area[index]
+            hand[index] = 0
+            play_area[index] = 0
+        self.latest_played = None
 
     def remove_from_hand(self, card: Card):
-        if card not in self.hand:
+        if not self.hand[card.supply_index]:
             raise CardNotInHand
-        self.hand[card] -= 1
-        self.hand += Counter()
+        self.hand[card.supply_index] -= 1
         return card
 
-    def remove_card_effect(self, effect: Effect):
-        self.delayed_card_effects.remove(effect)
-
-    def resolve_card_effects(self, state: 'State'):
-        for effect in self.delayed_card_effects:
-            effect.resolve(state)
+    def trash_from_hand(self, card: Card, state: 'State'):
+        if self.logger.level <= INFO:
+            self.logger.log(INFO, 'trash', player=self, card=card)
+        state.add_to_trash(self.remove_from_hand(card))
+        self.deck[card.supply_index] -= 1
+        return card
 
     def draw(self, num_cards: int):
+        draw_pile = self.draw_pile
+        hand = self.hand
+        logger = self.logger
+        # Public API only, so any random.Random compatible generator can be injected. randrange(n) is exactly uniform
+        # and draws the same numbers as random.shuffle does.
+        randrange = self.rng.randrange
         for i in range(num_cards):
             # If the draw pile is empty
-            if not self.draw_pile:
+            if not draw_pile:
                 # If the discard pile is empty stop drawing
-                if not self.discard_pile:
+                if not any(self.discard_pile):
                     break
-                # Shuffle the discard pile under the draw pile and set the discard pile as empty
-                self.draw_pile = sample(self.discard_pile, len(self.discard_pile)) + self.draw_pile
-                self.discard_pile = []
-
-            # Draw card from draw pile to hand
-            self.hand.update([self.draw_pile.pop()])
+                # Move the discard pile to the draw pile and set the discard pile as empty. It is not shuffled here,
+                # every draw below picks a uniformly random remaining card instead.
+                discard_pile = self.discard_pile
+                for index, count in enumerate(discard_pile):
+                    if count:
+                        draw_pile.extend([index] * count)
+                        discard_pile[index] = 0
+
+            # Draw a random card from the draw pile to hand: one step of an incremental Fisher-Yates shuffle
+            position = randrange(len(draw_pile))
+            last = draw_pile.pop()
+            if position < len(draw_pile):
+                index = draw_pile[position]
+                draw_pile[position] = last
+            else:
+                index = last
+            hand[index] += 1
+            if logger.level <= DEBUG:
+                logger.log(DEBUG, 'draw', player=self, card=self.supply[index])
 
     def get_input(self, line, cards, state):
         return input(line)
 
-    def prompt_reaction(self, card: Card, state: 'State') -> bool:
-        react = self.get_input(f'React with {str(card)}? Y or N', None, state)
-        return react == 'Y'
+    def choose(self, decision: Decision) -> int:
+        """
+        Returns the answer to the decision as a supply position, or decision.skip. Bots override this; by default the
+        player is asked for a card name with get_input.
+        """
+        cards = None if decision.kind == REACTION else decision.cards
+        return decision.index_of(self.get_input(decision.line, cards, decision.state))
+
+    def decide(self, decision: Decision):
+        """
+        Answers the decision with choose, see State.run. The decision is recorded if the game has a recorder.
+        """
+        state = decision.state
+        stats = state.stats
+        if stats is None:
+            answer = decision.from_index(self.choose(decision))
+        else:
+            start = perf_counter()
+            answer = decision.from_index(self.choose(decision))
+            stats.add(DECISION, self.__class__.__name__, perf_counter() - start)
+        if state.recorder is not None:
+            state.recorder.record(decision, answer)
+        return answer
+
+    def prompt_reaction(self, card: Card, state: 'State'):
+        """
+        Coroutine returning whether the player reacts with the card
+        """
+        return (yield Decision(self, state, REACTION, 'React with {cards[0]}? Y or N', [card]))
 
     def prompt_discard(self, num_discards: int, state: 'State'):
         # TODO: Refactor to allow for flexible discarding (see Cellar). Meybe a force discard and a prompt discard?
         """
-        Prompts the player to discard. Returns the number of cards discarded.
+        Coroutine that prompts the player to discard
         :param state: Game state
         :param num_discards: Number of cards to be discarded
         """
-        while self.hand and num_discards > 0:
-            sorted_hand = sorted(list(self.hand), key=card_sort)
-            card_name = self.get_input(
-                f'Discard {num_discards} cards'
-                f'Hand: {sorted_hand}',
-                sorted_hand,
-                state
-            )
+        while self.hand_size and num_discards > 0:
+            card = yield Decision(self, state, DISCARD, f'Discard {num_discards} cardsHand: {{cards}}',
+                                  self.cards_in_hand())
             # If the prompted card is in hand, discard it
-            card = next((card for card in self.hand if card.name == card_name), None)
             if card:
-                self.hand[card] -= 1
-                self.hand += Counter()  # Remove 0 and negative counts
-                self.discard_pile.append(card)
+                self.add_to_discard(self.remove_from_hand(card))
                 num_discards -= 1
-                print(f'Discarded {card.name}')
-            else:
-                print(f'{card.name} is not in hand')
+                if self.logger.level <= DEBUG:
+                    self.logger.log(DEBUG, 'discard', player=self, card=card)
 
     def prompt_trash(self, state: 'State', num_trashes: int = 0, trashable_cards: typing.Set[Card] = None):
         # TODO: Do a "prompt_select_card" that takes in a set of cards. High priority.
 
-        trashable_cards_in_hand = trashable_cards & set(self.hand.elements())
+        # Only the trashable cards are offered, so the legal answers of the decision match the rule
+        trashable_cards_in_hand = [card for card in self.cards_in_hand() if card in trashable_cards]
         while trashable_cards_in_hand and num_trashes > 0:
-            sorted_hand = sorted(list(self.hand), key=card_sort)
-            card_name = self.get_input(
-                f'Trash {num_trashes} cards'
-                f'Hand: {sorted_hand}',
-                sorted_hand,
-                state
-            )
+            card = yield Decision(self, state, TRASH, f'Trash {num_trashes} cardsHand: {{cards}}',
+                                  trashable_cards_in_hand)
             # If the prompted card is in hand, trash it
-            card = next((card for card in self.hand if card.name == card_name), None)
             if card:
-                # Remove card from hand
-                self.hand[card] -= 1
-                self.hand += Counter()  # Remove 0 and negative counts
-
-                # Add card to trash
-                state.trash.update([card])
+                # Move card from hand to trash
+                self.trash_from_hand(card, state)
 
                 num_trashes -= 1
-                print(f'Trashed {card.name}')
-                trashable_cards_in_hand = trashable_cards & set(self.hand.elements())
-            else:
-                print(f'{card.name} is not in hand')
+                trashable_cards_in_hand = [card for card in self.cards_in_hand() if card in trashable_cards]
 
-    def prompt_select_card(self, cards: typing.List[Card], state: 'State'):
+    def prompt_select_card(self, cards: typing.List[Card], state: 'State', kind: str = SELECT):
+        """
+        Coroutine returning the selected card, or None if the player skips or there are no cards to select from
+        :param kind: Kind of the decision, e.g. TRASH when a card resolves by trashing the selected card. The decision
+            can be skipped whatever its kind.
+        """
         if cards:
-            cards = sorted(cards, key=card_sort)
-            card_name = self.get_input(
-                f'Select a card from {cards}',
-                cards,
-                state
-            )
-            print(f'TEST: {card_name}')
-            return next((card for card in cards if card.name == card_name), None)
+            card = yield Decision(self, state, kind, 'Select a card from {cards}', cards, can_skip=True)
+            if self.logger.level <= DEBUG:
+                self.logger.log(DEBUG, 'decision', player=self, card=card)
+            return card
 
     def buy(self, card: Card, state: 'State'):
+        if self.logger.level <= INFO:
+            self.logger.log(INFO, 'buy', player=self, card=card)
         self.gain(card, state)
         self.buys -= 1
 
     def gain(self, card: Card, state: 'State'):
         self.add_to_discard(state.remove_from_supply(card))
+        self.deck[card.supply_index] += 1
+        if self.logger.level <= DEBUG:
+            self.logger.log(DEBUG, 'gain', player=self, card=card)
+
+    def gain_to_hand(self, card: Card, state: 'State'):
+        self.add_to_hand(state.remove_from_supply(card))
+        self.deck[card.supply_index] += 1
+        if self.logger.level <= DEBUG:
+            self.logger.log(DEBUG, 'gain_to_hand', player=self, card=card)
 
     def prompt_gain(self, worth: int, supply: typing.List[Card], state: 'State'):
         # TODO: Maybe prompt_gain should wrap prompt_buy?
         # Can only gain cards if the corresponding supply pile is not empty and the worth is higher than the price
-        available_cards = [card for card in supply if not card.is_supply_empty() and card.price <= worth]
+        available_cards = [card for card in supply if not card.is_supply_empty(state) and card.price <= worth]
         # If there are available cards, prompt for gain
         if available_cards:
             has_gained = False
             while not has_gained:
-                sorted_available = sorted(available_cards, key=lambda x: x.price)
-                card_name = self.get_input(
-                    f'Gain a card from'
-                    f'Supply: {sorted_available}',
-                    sorted_available,
-                    state
-                )
-                card = next((card for card in available_cards if card.name == card_name), None)
+                card = yield Decision(self, state, GAIN, 'Gain a card fromSupply: {cards}', available_cards)
                 # If the typed card was available, add it to the players discard
                 if card:
-                    self.discard_pile.append(card.gain())
+                    self.gain(card, state)
                     has_gained = True
 
     def reset_turn_attributes(self):
         self.money: int = 0
         self.buys: int = 1
         self.actions: int = 1
-
-
-def card_sort(cards: Card) -> typing.List[str]:
-    return [cards.tag, cards.name]
@@ -0,0 +1,178 @@
+"""
+Exact probabilities of a player's next draws, computed with (multivariate) hypergeometric distributions instead of
+sampling. The draw pile is in random order (Player.draw picks a uniformly random card), so the next draws are a
+uniformly random subset of it; once it runs out the discard pile is drawn from the same way.
+
+Distributions are dicts from value to probability. Results only depend on card counts and are memoized on them in
+bounded LRU caches, so repeated queries during a game are dictionary lookups. Cached results are immutable tuples,
+the dicts returned are built per call and can be modified by the caller.
+"""
+from collections import Counter
+from functools import lru_cache
+from math import comb
+from typing import Dict, Tuple
+
+from abstract_cards import Card
+
+# Entries of the memoized functions. _expected_hands recurses over the draw piles left after every hand, so it keeps
+# more entries than the others.
+CACHE_SIZE = 4096
+EXPECTED_HANDS_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def hypergeometric(population: int, successes: int, draws: int) -> Tuple[float, ...]:
+    """
+    Probabilities of drawing 0..draws successes when drawing without replacement from the population
+    """
+    total = comb(population, draws)
+    return tuple(comb(successes, x) * comb(population - successes, draws - x) / total for x in range(draws + 1))
+
+
+def at_least(population: int, successes: int, draws: int, k: int) -> float:
+    """
+    Probability of drawing at least k successes
+    """
+    return sum(hypergeometric(population, successes, draws)[k:])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def draw_outcomes(counts: Tuple[int, ...], draws: int) -> Tuple[Tuple[Tuple[int, ...], float], ...]:
+    """
+    Multivariate hypergeometric distribution: every way of drawing the number of cards from the groups of cards with
+    the given counts, as (cards drawn per group, probability)
+    """
+    total = comb(sum(counts), draws)
+    outcomes = []
+
+    def expand(group: int, remaining: int, drawn: Tuple[int, ...], ways: int):
+        if group == len(counts) - 1:
+            if remaining <= counts[group]:
+                outcomes.append((drawn + (remaining,), ways * comb(counts[group], remaining) / total))
+            return
+        for x in range(min(remaining, counts[group]) + 1):
+            expand(group + 1, remaining - x, drawn + (x,), ways * comb(counts[group], x))
+
+    if counts:
+        expand(0, draws, (), 1)
+    elif not draws:
+        outcomes.append(((), 1.0))
+    return tuple(outcomes)
+
+
+def sum_distribution(values: Tuple[int, ...], counts: Tuple[int, ...], draws: int) -> Dict[int, float]:
+    """
+    Distribution of the sum of the values of the drawn cards, card group i having values[i] and counts[i] copies
+    """
+    return dict(_sum_outcomes(values, counts, draws))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _sum_outcomes(values: Tuple[int, ...], counts: Tuple[int, ...], draws: int) -> Tuple[Tuple[int, float], ...]:
+    # sum_distribution as (sum, probability) pairs, immutable so the cache cannot be changed through a result
+    distribution = Counter()
+    for drawn, probability in draw_outcomes(counts, draws):
+        distribution[sum(value * x for value, x in zip(values, drawn))] += probability
+    return tuple(distribution.items())
+
+
+def _grouped(cards: Dict[Card, int], attribute: str) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    # Groups card counts by the value of a card attribute, e.g. worth
+    groups = Counter()
+    for card, count in cards.items():
+        groups[getattr(card, attribute)] += count
+    values = tuple(sorted(groups))
+    return values, tuple(groups[value] for value in values)
+
+
+def draw_pile_cards(player: 'Player') -> Dict[Card, int]:
+    return {player.supply[index]: count for index, count in Counter(player.draw_pile).items()}
+
+
+def discard_pile_cards(player: 'Player', after_cleanup: bool = False) -> Dict[Card, int]:
+    """
+    Cards in the discard pile, including the hand and play area if after_cleanup
+    """
+    counts = player.discard_pile
+    if after_cleanup:
+        counts = [d + h + p for d, h, p in zip(player.discard_pile, player.hand, player.play_area)]
+    return {card: count for card, count in zip(player.supply, counts) if count}
+
+
+def next_draw_distribution(player: 'Player', draws: int, attribute: str = 'worth',
+                           after_cleanup: bool = False) -> Dict[int, float]:
+    """
+    Distribution of the summed attribute (e.g. worth or draws) of the next cards drawn. If the draw pile runs out,
+    all of it is drawn and the rest comes from the reshuffled discard pile.
+    :param player: Player whose zones are used
+    :param draws: Number of cards drawn
+    :param attribute: Card attribute that is summed
+    :param after_cleanup: If True, the hand and play area are counted as discarded first, as for the next hand
+    """
+    draw_pile = draw_pile_cards(player)
+    values, counts = _grouped(draw_pile, attribute)
+    pile_size = sum(counts)
+    if draws <= pile_size:
+        return sum_distribution(values, counts, draws)
+
+    # The whole draw pile is drawn, then the rest from the reshuffled discard pile
+    drawn = sum(value * count for value, count in zip(values, counts))
+    values, counts = _grouped(discard_pile_cards(player, after_cleanup), attribute)
+    remaining = min(draws - pile_size, sum(counts))
+    return {drawn + total: p for total, p in _sum_outcomes(values, counts, remaining)}
+
+
+def next_hand_money(player: 'Player') -> Dict[int, float]:
+    """
+    Distribution of the treasure worth of the hand the player draws at the end of this turn
+    """
+    return next_draw_distribution(player, 5, 'worth', after_cleanup=True)
+
+
+def expected_next_hand_money(player: 'Player') -> float:
+    return sum(money * p for money, p in next_hand_money(player).items())
+
+
+def draw_at_least(player: 'Player', card: Card, k: int, draws: int) -> float:
+    """
+    Probability that draw(draws) draws at least k copies of the card
+    """
+    pile_size = len(player.draw_pile)
+    in_pile = player.draw_pile.count(card.supply_index)
+    if draws <= pile_size:
+        return at_least(pile_size, in_pile, draws, k)
+    # All copies in the draw pile are drawn, the rest come from the reshuffled discard pile
+    discard_size = sum(player.discard_pile)
+    return at_least(discard_size, player.discard_pile[card.supply_index], min(draws - pile_size, discard_size),
+                    k - in_pile) if k > in_pile else 1.0
+
+
+@lru_cache(maxsize=EXPECTED_HANDS_CACHE_SIZE)
+def _expected_hands(counts: Tuple[int, ...], draws: Tuple[int, ...], pending: int, hand_size: int) -> float:
+    # Expected number of full hands drawn from the pile (counts per draws value) before it runs out, when pending
+    # cards still have to be drawn by cards played this turn
+    pile_size = sum(counts)
+    if pending:
+        if pending > pile_size:
+            return 0.0
+        return sum(
+            p * _expected_hands(tuple(c - x for c, x in zip(counts, drawn)), draws,
+                                sum(d * x for d, x in zip(draws, drawn)), hand_size)
+            for drawn, p in draw_outcomes(counts, pending)
+        )
+    if hand_size > pile_size:
+        return 0.0
+    return sum(
+        p * (1 + _expected_hands(tuple(c - x for c, x in zip(counts, drawn)), draws,
+                                 sum(d * x for d, x in zip(draws, drawn)), hand_size))
+        for drawn, p in draw_outcomes(counts, hand_size)
+    )
+
+
+def expected_turns_until_reshuffle(player: 'Player', hand_size: int = 5) -> float:
+    """
+    Expected number of future hands drawn entirely from the current draw pile, assuming every drawing card in those
+    hands is played (and draws its Card.draws cards). Without drawing cards this is len(draw_pile) // hand_size.
+    """
+    draws, counts = _grouped(draw_pile_cards(player), 'draws')
+    return _expected_hands(counts, draws, 0, hand_size)
@@ -0,0 +1,80 @@
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+# Categories of timed sections
+PHASE = 'phase'
+RESOLVE = 'resolve'
+ATTACK = 'attack'
+REACTION = 'reaction'
+DECISION = 'decision'
+
+CLEANUP_PHASE = 'CLEANUP'
+
+
+class GameStats:
+    """
+    Cumulative wall time and call counts of the sections of the turn loop, keyed by category and name:
+        phase       Action, treasure, buy and cleanup phase
+        resolve     Card.resolve per card
+        attack      Reactions to and resolution of an attack, per attacking card
+        reaction    Card.react per reaction card
+        decision    Player.choose per bot class
+    Times are inclusive, e.g. the resolve time of Cellar includes the decisions made while resolving it. Attach the
+    same stats to any number of games (State.stats, or run_game(..., stats=stats)) to aggregate a batch. Games without
+    stats only pay a None check per section.
+    """
+
+    def __init__(self):
+        self.timings: Dict[Tuple[str, str], List[float]] = {}
+
+    def add(self, category: str, name: str, elapsed: float):
+        timing = self.timings.get((category, name))
+        if timing is None:
+            self.timings[(category, name)] = [elapsed, 1]
+        else:
+            timing[0] += elapsed
+            timing[1] += 1
+
+    def lap(self, category: str, name: str, start: float) -> float:
+        """
+        Adds the time since start and returns the current time, so consecutive sections can be timed with one clock read
+        """
+        now = perf_counter()
+        self.add(category, name, now - start)
+        return now
+
+    def merge(self, other: 'GameStats'):
+        """
+        Adds the timings of other, e.g. collected in another process
+        """
+        for (category, name), (elapsed, calls) in other.timings.items():
+            timing = self.timings.setdefault((category, name), [0.0, 0])
+            timing[0] += elapsed
+            timing[1] += calls
+
+    def total_time(self, category: str, name: str) -> float:
+        return self.timings.get((category, name), (0.0, 0))[0]
+
+    def calls(self, category: str, name: str) -> int:
+        return self.timings.get((category, name), (0.0, 0))[1]
+
+    def as_dict(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Returns the timings as {category: {name: {'seconds': ..., 'calls': ..., 'mean_us': ...}}}, e.g. to dump as JSON
+        """
+        result = {}
+        for (category, name), (elapsed, calls) in sorted(self.timings.items()):
+            result.setdefault(category, {})[name] = {
+                'seconds': elapsed,
+                'calls': calls,
+                'mean_us': elapsed / calls * 1e6,
+            }
+        return result
+
+    def __str__(self):
+        lines = [f'{"category":<10} {"name":<16} {"seconds":>10} {"calls":>10} {"mean us":>10}']
+        for category, names in self.as_dict().items():
+            for name, timing in sorted(names.items(), key=lambda item: -item[1]['seconds']):
+                lines.append(f'{category:<10} {name:<16} {timing["seconds"]:>10.4f} {timing["calls"]:>10} '
+                             f'{timing["mean_us"]:>10.1f}')
+        return '\n'.join(lines)
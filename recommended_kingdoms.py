@@ -1,4 +1,4 @@
-from typing import List, Type
+from typing import Dict, List, Tuple, Type
 
 from abstract_cards import Card
 from cards import Estate, Duchy, Province, Curse, Copper, Silver, Gold, Cellar, Market, Merchant, Militia, Mine, Moat, \
@@ -20,5 +20,17 @@ COMMON = [
 FIRST_GAME = COMMON + [Cellar, Market, Merchant, Militia, Mine, Moat, Remodel, Smithy, Village, Workshop]
 
 
+# Card instances per kingdom and number of players. Cards do not change during a game (the supply pile sizes live in
+# the State), so all games with the same kingdom and number of players share them. The one exception is
+# Card.supply_index: it is set by the first State the card is placed in, and every State using a pooled card must
+# place it at that same position. Build supplies with initialize_kingdom instead of reordering or subsetting the
+# returned lists; State raises SupplyIndexConflict otherwise.
+_kingdom_pool: Dict[Tuple[Tuple[Type[Card], ...], int], List[Card]] = {}
+
+
 def initialize_kingdom(kingdom: List[Type[Card]], num_players: int):
-    return [card(num_players) for card in kingdom]
\ No newline at end of file
+    key = (tuple(kingdom), num_players)
+    cards = _kingdom_pool.get(key)
+    if cards is None:
+        cards = _kingdom_pool[key] = [card(num_players) for card in kingdom]
+    return list(cards)
\ No newline at end of file
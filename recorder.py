@@ -0,0 +1,147 @@
+import json
+import os
+from typing import Optional, Union
+
+import numpy as np
+
+from bot import state_encoder
+from decisions import DISCARD, GAIN, REACTION, SELECT, TRASH, Decision
+
+SKIPPED = -1
+
+# Kinds of decisions, stored by position in the kinds column
+DECISION_KINDS = (SELECT, REACTION, DISCARD, TRASH, GAIN)
+_KIND_CODES = {kind: code for code, kind in enumerate(DECISION_KINDS)}
+
+
+class DecisionRecorder:
+    """
+    Records the bot_state features, the chosen card and the eventual outcome of every decision made with
+    Player.decide in a simulation run: selections, discards, trashes, gains and reactions.
+    Rows are kept in preallocated numpy buffers and flushed as .npy shards (one file per column and chunk) once a
+    chunk is full. Shards only ever contain complete games, so every row has its outcome filled in.
+    Files written to the directory:
+        columns.json        Feature column names, card names of the kingdom and decision kinds
+        features_#####.npy  Feature matrix (rows x features)
+        actions_#####.npy   Supply index of the chosen card (the reaction card if the player reacted), -1 if the
+                            decision was skipped
+        kinds_#####.npy     Kind of the decision, as position in the decision kinds of columns.json
+        games_#####.npy     Game number of the decision
+        seats_#####.npy     Seat of the deciding player
+        outcomes_#####.npy  Share of the win of the deciding player (1 win, 1/n n-way tie, 0 loss)
+        final_vp_#####.npy  Final victory points of the deciding player
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 100_000):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.encoder = None
+        self.num_rows = 0
+        self.num_shards = 0
+        self.game_number = 0
+        self._game_start = 0
+        self._seats = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, decision: Decision, answer: Union[Optional['Card'], bool]):
+        """
+        Records the decision and its answer. Must be called before the answer is applied to the state.
+        """
+        player = decision.player
+        state = decision.state
+        if self.encoder is None:
+            self._allocate(state)
+        elif self.encoder is not state_encoder(state):
+            raise ValueError('All recorded games must use the same kingdom')
+        if self.num_rows == len(self.actions):
+            self._grow()
+
+        row = self.num_rows
+        self.encoder.encode(player, state, self.features[row])
+        if decision.kind == REACTION:
+            card = decision.cards[0] if answer else None
+        else:
+            card = answer
+        self.actions[row] = SKIPPED if card is None else self.encoder.card_index[card.__class__]
+        self.kinds[row] = _KIND_CODES[decision.kind]
+        self.games[row] = self.game_number
+        self.seats[row] = self._seat(player, state)
+        self.num_rows += 1
+
+    def end_game(self, state: 'State'):
+        """
+        Fills in the outcome of every decision of the finished game and flushes if the chunk is full
+        """
+        victory_points = [player.victory_points for player in state.players]
+        most_victory_points = max(victory_points)
+        winners = victory_points.count(most_victory_points)
+        if self.num_rows > self._game_start:
+            seats = self.seats[self._game_start:self.num_rows]
+            final_vp = np.array(victory_points, dtype=np.int16)[seats]
+            self.final_vp[self._game_start:self.num_rows] = final_vp
+            self.outcomes[self._game_start:self.num_rows] = (final_vp == most_victory_points) / winners
+
+        self.game_number += 1
+        self._game_start = self.num_rows
+        self._seats = {}
+        if self.num_rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the rows of all completed games to a new shard
+        """
+        num_rows = self._game_start
+        if not num_rows:
+            return
+        shard = f'{self.num_shards:05d}'
+        for name in ('features', 'actions', 'kinds', 'games', 'seats', 'outcomes', 'final_vp'):
+            np.save(os.path.join(self.directory, f'{name}_{shard}.npy'), getattr(self, name)[:num_rows])
+        self.num_shards += 1
+
+        # Move the rows of an unfinished game to the front of the buffers
+        remaining = self.num_rows - num_rows
+        for name in ('features', 'actions', 'kinds', 'games', 'seats'):
+            column = getattr(self, name)
+            column[:remaining] = column[num_rows:self.num_rows]
+        self.num_rows = remaining
+        self._game_start = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _seat(self, player: 'Player', state: 'State') -> int:
+        seat = self._seats.get(player.name)
+        if seat is None:
+            seat = self._seats[player.name] = state.players.index(player)
+        return seat
+
+    def _allocate(self, state: 'State'):
+        self.encoder = state_encoder(state)
+        with open(os.path.join(self.directory, 'columns.json'), 'w') as f:
+            json.dump({
+                'features': self.encoder.columns,
+                'cards': [card.__name__ for card in self.encoder.kingdom],
+                'kinds': list(DECISION_KINDS),
+            }, f)
+        self.features = self.encoder.empty(self.chunk_size)
+        self.actions = np.zeros(self.chunk_size, dtype=np.int8)
+        self.kinds = np.zeros(self.chunk_size, dtype=np.int8)
+        self.games = np.zeros(self.chunk_size, dtype=np.int64)
+        self.seats = np.zeros(self.chunk_size, dtype=np.int8)
+        self.outcomes = np.zeros(self.chunk_size, dtype=np.float32)
+        self.final_vp = np.zeros(self.chunk_size, dtype=np.int16)
+
+    def _grow(self):
+        # A single game did not fit in the chunk; double the buffers
+        for name in ('features', 'actions', 'kinds', 'games', 'seats', 'outcomes', 'final_vp'):
+            column = getattr(self, name)
+            grown = np.zeros((2 * len(column),) + column.shape[1:], dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
@@ -0,0 +1,302 @@
+"""
+Binary game replay format. A replay file starts with FILE_MAGIC followed by one length-prefixed record per game:
+
+    u32         Length of the rest of the record in bytes
+    header      GAME_HEADER: legacy seed field (always -1), number of players, number of cards, number of turns,
+                number of events, length of the metadata
+    metadata    UTF-8 JSON with the seed, card names, player names, bot classes, end reason and final victory
+                points, padded with spaces to a multiple of 4 bytes. The seed is kept here because seeds can be
+                any int; files written before it moved have it in the header instead (-1 if None).
+    events      One EVENT (u8 type, u8 seat, u16 value) per event. The value is the supply position of the card, the
+                phase code or the turn number.
+    turn index  One u32 per turn: index of the first event of the turn
+    snapshots   One u16 array per turn, taken at the start of the turn: supply pile sizes, trash and per player the
+                deck, hand and discard pile counts, all indexed by supply position
+
+Any turn can be rebuilt by loading its snapshot and replaying the events of the turn, see ReplayGame.reconstruct.
+All integers are little-endian.
+"""
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import IO, Dict, Iterator, List, Optional
+
+from constants import ACTION_PHASE, TREASURE_PHASE, BUY_PHASE
+from game_log import DEBUG, Sink
+
+FILE_MAGIC = b'DOMRPLY1'
+RECORD_LENGTH = struct.Struct('<I')
+GAME_HEADER = struct.Struct('<qBBHII')
+EVENT = struct.Struct('<BBH')
+
+# Event types
+DRAW = 1
+PLAY = 2
+BUY = 3
+GAIN = 4
+GAIN_TO_HAND = 5
+TRASH = 6
+DISCARD = 7
+CLEANUP = 8
+PHASE = 9
+TURN = 10
+
+EVENT_TYPES = {
+    'draw': DRAW,
+    'play': PLAY,
+    'buy': BUY,
+    'gain': GAIN,
+    'gain_to_hand': GAIN_TO_HAND,
+    'trash': TRASH,
+    'discard': DISCARD,
+    'cleanup': CLEANUP,
+    'phase': PHASE,
+    'turn': TURN,
+}
+PHASE_CODES = {ACTION_PHASE: 0, TREASURE_PHASE: 1, BUY_PHASE: 2}
+NO_SEAT = 255
+
+
+class ReplayWriter(Sink):
+    """
+    Logger sink that writes every finished game to a binary replay file. Attach it to the logger of the games to
+    record, e.g. GameLogger([writer]) or run_game(..., replay=writer). Games are buffered in memory until their
+    game_end event and appended to the file as a single record.
+    """
+    level = DEBUG
+
+    def __init__(self, path: str):
+        is_new = not os.path.exists(path) or not os.path.getsize(path)
+        self.stream: IO = open(path, 'ab')
+        if is_new:
+            self.stream.write(FILE_MAGIC)
+        self._game = None
+
+    def write(self, level: int, event: str, fields: Dict):
+        if event == 'game_start':
+            self._start_game(fields)
+        elif self._game is None:
+            return
+        elif event == 'snapshot':
+            self._snapshot(fields)
+        elif event == 'game_end':
+            self._end_game(fields)
+        else:
+            event_type = EVENT_TYPES.get(event)
+            if event_type is None:
+                return
+            seat = self._game['seats'][id(fields['player'])] if 'player' in fields else NO_SEAT
+            if 'card' in fields:
+                value = fields['card'].supply_index
+            elif 'phase' in fields:
+                value = PHASE_CODES[fields['phase']]
+            else:
+                value = fields.get('turn_number', 0)
+            self._game['events'].extend(EVENT.pack(event_type, seat, value))
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _start_game(self, fields: Dict):
+        players = fields['players']
+        seed = fields['seed']
+        # Checked before the game is played rather than when it is written
+        try:
+            json.dumps(seed)
+        except (TypeError, ValueError):
+            raise ValueError(f'Seed {seed!r} cannot be stored in a replay') from None
+        self._game = {
+            'seed': seed,
+            'cards': [card.name for card in fields['supply']],
+            'players': [player.name for player in players],
+            'bots': [player.__class__.__name__ for player in players],
+            'seats': {id(player): seat for seat, player in enumerate(players)},
+            'events': bytearray(),
+            'turns': array('I'),
+            'snapshots': array('H'),
+        }
+
+    def _snapshot(self, fields: Dict):
+        game = self._game
+        game['turns'].append(len(game['events']) // EVENT.size)
+        game['snapshots'].extend(fields['supply_sizes'])
+        game['snapshots'].extend(fields['trash'])
+        for deck, hand, discard_pile in zip(fields['decks'], fields['hands'], fields['discard_piles']):
+            game['snapshots'].extend(deck)
+            game['snapshots'].extend(hand)
+            game['snapshots'].extend(discard_pile)
+
+    def _end_game(self, fields: Dict):
+        game = self._game
+        metadata = json.dumps({
+            'seed': game['seed'],
+            'cards': game['cards'],
+            'players': game['players'],
+            'bots': game['bots'],
+            'end_reason': fields['reason'],
+            'turn_number': fields['turn_number'],
+            'victory_points': [fields['victory_points'][name] for name in game['players']],
+        }).encode()
+        metadata += b' ' * (-len(metadata) % 4)
+        turns, snapshots = game['turns'], game['snapshots']
+        if sys.byteorder == 'big':
+            turns.byteswap()
+            snapshots.byteswap()
+        header = GAME_HEADER.pack(
+            -1, len(game['players']), len(game['cards']), len(game['turns']), len(game['events']) // EVENT.size,
+            len(metadata),
+        )
+        body = header + metadata + bytes(game['events']) + turns.tobytes() + snapshots.tobytes()
+        self.stream.write(RECORD_LENGTH.pack(len(body)) + body)
+        self._game = None
+
+
+class ReplayGame:
+    """
+    A game read back from a replay file
+    """
+
+    def __init__(self, record: bytes):
+        seed, num_players, num_cards, num_turns, num_events, metadata_length = GAME_HEADER.unpack_from(record)
+        offset = GAME_HEADER.size
+        metadata = json.loads(record[offset:offset + metadata_length])
+        offset += metadata_length
+
+        self.seed: Optional[int] = metadata['seed'] if 'seed' in metadata else None if seed == -1 else seed
+        self.num_players = num_players
+        self.num_cards = num_cards
+        self.cards: List[str] = metadata['cards']
+        self.players: List[str] = metadata['players']
+        self.bots: List[str] = metadata['bots']
+        self.end_reason: str = metadata['end_reason']
+        self.turn_number: int = metadata['turn_number']
+        self.victory_points: List[int] = metadata['victory_points']
+
+        self.events = [EVENT.unpack_from(record, offset + i * EVENT.size) for i in range(num_events)]
+        offset += num_events * EVENT.size
+        self.turns = list(struct.unpack_from(f'<{num_turns}I', record, offset))
+        offset += num_turns * 4
+        self.snapshot_size = (2 + 3 * num_players) * num_cards
+        snapshots = array('H')
+        snapshots.frombytes(record[offset:offset + 2 * num_turns * self.snapshot_size])
+        if sys.byteorder == 'big':
+            snapshots.byteswap()
+        self.snapshots = snapshots
+
+    def turn_events(self, turn: int) -> List[tuple]:
+        """
+        Returns the (type, seat, value) events of the turn
+        """
+        end = self.turns[turn + 1] if turn + 1 < len(self.turns) else len(self.events)
+        return self.events[self.turns[turn]:end]
+
+    def reconstruct(self, turn: int, num_events: int = None) -> Dict[str, list]:
+        """
+        Rebuilds the card areas after the first num_events events of the turn (all events of the turn if None)
+        from the snapshot at the start of the turn. Returns the supply pile sizes, the trash and per player the
+        deck, hand, discard pile, play area and draw pile counts, all indexed by supply position.
+        """
+        k = self.num_cards
+        snapshot = self.snapshots[turn * self.snapshot_size:(turn + 1) * self.snapshot_size]
+        supply_sizes = list(snapshot[:k])
+        trash = list(snapshot[k:2 * k])
+        decks, hands, discard_piles, play_areas, draw_piles = [], [], [], [], []
+        for seat in range(self.num_players):
+            offset = (2 + 3 * seat) * k
+            deck, hand, discard_pile = (list(snapshot[offset + i * k:offset + (i + 1) * k]) for i in range(3))
+            decks.append(deck)
+            hands.append(hand)
+            discard_piles.append(discard_pile)
+            play_areas.append([0] * k)
+            draw_piles.append([deck[i] - hand[i] - discard_pile[i] for i in range(k)])
+
+        events = self.turn_events(turn)
+        for event_type, seat, value in events[:num_events]:
+            if event_type == DRAW:
+                if not any(draw_piles[seat]):
+                    # Reshuffle the discard pile into the draw pile
+                    for i in range(k):
+                        draw_piles[seat][i] += discard_piles[seat][i]
+                        discard_piles[seat][i] = 0
+                draw_piles[seat][value] -= 1
+                hands[seat][value] += 1
+            elif event_type == PLAY:
+                hands[seat][value] -= 1
+                play_areas[seat][value] += 1
+            elif event_type in (GAIN, GAIN_TO_HAND):
+                supply_sizes[value] -= 1
+                decks[seat][value] += 1
+                (hands if event_type == GAIN_TO_HAND else discard_piles)[seat][value] += 1
+            elif event_type == TRASH:
+                hands[seat][value] -= 1
+                decks[seat][value] -= 1
+                trash[value] += 1
+            elif event_type == DISCARD:
+                hands[seat][value] -= 1
+                discard_piles[seat][value] += 1
+            elif event_type == CLEANUP:
+                for i in range(k):
+                    discard_piles[seat][i] += hands[seat][i] + play_areas[seat][i]
+                    hands[seat][i] = 0
+                    play_areas[seat][i] = 0
+
+        return {
+            'supply_sizes': supply_sizes,
+            'trash': trash,
+            'decks': decks,
+            'hands': hands,
+            'discard_piles': discard_piles,
+            'play_areas': play_areas,
+            'draw_piles': draw_piles,
+        }
+
+
+def read_games(path: str) -> Iterator[ReplayGame]:
+    """
+    Reads the games of a replay file one record at a time
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f'{path} is not a replay file')
+        while True:
+            length = f.read(RECORD_LENGTH.size)
+            if not length:
+                break
+            yield ReplayGame(f.read(RECORD_LENGTH.unpack(length)[0]))
+
+
+def game_offsets(path: str) -> List[int]:
+    """
+    Returns the file offsets of the game records by skipping from length prefix to length prefix
+    """
+    offsets = []
+    with open(path, 'rb') as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f'{path} is not a replay file')
+        offset = len(FILE_MAGIC)
+        while True:
+            length = f.read(RECORD_LENGTH.size)
+            if not length:
+                break
+            offsets.append(offset)
+            offset += RECORD_LENGTH.size + RECORD_LENGTH.unpack(length)[0]
+            f.seek(offset)
+    return offsets
+
+
+def read_game(path: str, offset: int) -> ReplayGame:
+    """
+    Reads the game record at the file offset, see game_offsets
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        length = RECORD_LENGTH.unpack(f.read(RECORD_LENGTH.size))[0]
+        return ReplayGame(f.read(length))
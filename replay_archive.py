@@ -0,0 +1,185 @@
+import json
+from typing import Iterable, Iterator, List, Sequence, Type, Union
+
+import numpy as np
+
+import cards
+from abstract_cards import Card
+from player import Player
+from replay import BUY, FILE_MAGIC, GAME_HEADER, RECORD_LENGTH
+
+EVENT_DTYPE = np.dtype([('type', 'u1'), ('seat', 'u1'), ('value', '<u2')])
+BUY_DTYPE = np.dtype([('turn', '<u2'), ('seat', 'u1'), ('card', '<u2')])
+
+
+class ArchivedGame:
+    """
+    A game of a memory-mapped replay file. The event, turn index and snapshot arrays are views into the mapped file,
+    nothing is copied until a derived array is computed.
+    """
+
+    def __init__(self, buffer: np.memmap, offset: int, path: str):
+        seed, num_players, num_cards, num_turns, num_events, metadata_length = GAME_HEADER.unpack_from(buffer, offset)
+        self.path = path
+        self.offset = offset
+        offset += GAME_HEADER.size
+        metadata = json.loads(bytes(buffer[offset:offset + metadata_length]))
+        offset += metadata_length
+
+        # Older files keep the seed in the header
+        self.seed = metadata['seed'] if 'seed' in metadata else None if seed == -1 else seed
+        self.num_players = num_players
+        self.num_cards = num_cards
+        self.num_turns = num_turns
+        self.cards: List[str] = metadata['cards']
+        self.players: List[str] = metadata['players']
+        self.bots: List[str] = metadata['bots']
+        self.end_reason: str = metadata['end_reason']
+        self.turn_number: int = metadata['turn_number']
+        self.final_victory_points: List[int] = metadata['victory_points']
+
+        self.events: np.ndarray = np.ndarray(num_events, EVENT_DTYPE, buffer, offset)
+        offset += num_events * EVENT_DTYPE.itemsize
+        self.turns: np.ndarray = np.ndarray(num_turns, '<u4', buffer, offset)
+        offset += num_turns * 4
+        # Rows per turn: supply pile sizes, trash, then deck, hand and discard pile per player
+        self.snapshots: np.ndarray = np.ndarray((num_turns, 2 + 3 * num_players, num_cards), '<u2', buffer, offset)
+
+    @property
+    def supply_sizes(self) -> np.ndarray:
+        """
+        Supply pile sizes at the start of every turn (turns x cards)
+        """
+        return self.snapshots[:, 0]
+
+    @property
+    def trash(self) -> np.ndarray:
+        """
+        Trash at the start of every turn (turns x cards)
+        """
+        return self.snapshots[:, 1]
+
+    @property
+    def decks(self) -> np.ndarray:
+        """
+        Cards owned by every player at the start of every turn (turns x players x cards)
+        """
+        return self.snapshots[:, 2::3]
+
+    @property
+    def hands(self) -> np.ndarray:
+        return self.snapshots[:, 3::3]
+
+    @property
+    def discard_piles(self) -> np.ndarray:
+        return self.snapshots[:, 4::3]
+
+    def event_turns(self) -> np.ndarray:
+        """
+        Turn (0-based) of every event
+        """
+        return np.searchsorted(self.turns, np.arange(len(self.events)), side='right') - 1
+
+    def victory_points(self) -> np.ndarray:
+        """
+        Victory points of every player at the start of every turn and, as the last row, at the end of the game
+        ((turns + 1) x players)
+        """
+        victory_points = self.decks @ card_victory_points(self.cards)
+        return np.vstack([victory_points, np.array(self.final_victory_points, dtype=victory_points.dtype)])
+
+    def buys(self) -> np.ndarray:
+        """
+        Buy sequence of the game as a structured array of (turn, seat, card), card being the supply position
+        """
+        is_buy = self.events['type'] == BUY
+        buys = np.empty(np.count_nonzero(is_buy), BUY_DTYPE)
+        buys['turn'] = self.event_turns()[is_buy]
+        buys['seat'] = self.events['seat'][is_buy]
+        buys['card'] = self.events['value'][is_buy]
+        return buys
+
+    def supply_depletion(self) -> np.ndarray:
+        """
+        Fraction of every supply pile that is gone at the start of every turn (turns x cards)
+        """
+        starting_sizes = self.supply_sizes[0]
+        return 1 - self.supply_sizes / np.maximum(starting_sizes, 1)
+
+    def has_kingdom(self, kingdom: Iterable[Union[Type[Card], str]]) -> bool:
+        """
+        Returns True if all the given cards are in the supply of the game
+        """
+        return {card if isinstance(card, str) else card.__name__ for card in kingdom} <= set(self.cards)
+
+    def has_bot(self, bot: Union[Type[Player], str]) -> bool:
+        return (bot if isinstance(bot, str) else bot.__name__) in self.bots
+
+
+class ReplayArchive:
+    """
+    Memory-mapped view of one or more replay files written by ReplayWriter. Opening an archive only reads the record
+    headers and metadata; all per-game arrays are views into the mapped files, so archives far larger than memory can
+    be scanned. Filtering returns a new archive sharing the same mappings.
+    """
+
+    def __init__(self, paths: Union[str, Sequence[str]], games: List[ArchivedGame] = None):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        if games is None:
+            games = []
+            for path in self.paths:
+                games.extend(_map_games(path))
+        self.games = games
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def __iter__(self) -> Iterator[ArchivedGame]:
+        return iter(self.games)
+
+    def __getitem__(self, i: int) -> ArchivedGame:
+        return self.games[i]
+
+    def filter(self, kingdom: Iterable[Union[Type[Card], str]] = None,
+               bot: Union[Type[Player], str] = None) -> 'ReplayArchive':
+        """
+        Returns the games whose supply contains all cards of the kingdom and in which the bot played
+        :param kingdom: Card classes or names, e.g. FIRST_GAME
+        :param bot: Bot class or class name, e.g. BigMoneyBot
+        """
+        games = self.games
+        if kingdom is not None:
+            kingdom = list(kingdom)
+            games = [game for game in games if game.has_kingdom(kingdom)]
+        if bot is not None:
+            games = [game for game in games if game.has_bot(bot)]
+        return ReplayArchive(self.paths, games)
+
+    def final_victory_points(self) -> np.ndarray:
+        """
+        Final victory points per game and seat (games x players). All games must have the same number of players.
+        """
+        return np.array([game.final_victory_points for game in self.games], dtype=np.int32)
+
+    def turn_numbers(self) -> np.ndarray:
+        return np.array([game.turn_number for game in self.games], dtype=np.int32)
+
+
+def card_victory_points(card_names: Sequence[str]) -> np.ndarray:
+    """
+    Victory points of the named cards, looked up on the card classes
+    """
+    return np.array([getattr(cards, name).victory_points for name in card_names], dtype=np.int32)
+
+
+def _map_games(path: str) -> List[ArchivedGame]:
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    if bytes(buffer[:len(FILE_MAGIC)]) != FILE_MAGIC:
+        raise ValueError(f'{path} is not a replay file')
+    games = []
+    offset = len(FILE_MAGIC)
+    while offset < len(buffer):
+        length, = RECORD_LENGTH.unpack_from(buffer, offset)
+        games.append(ArchivedGame(buffer, offset + RECORD_LENGTH.size, path))
+        offset += RECORD_LENGTH.size + length
+    return games
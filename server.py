@@ -0,0 +1,257 @@
+"""
+Asyncio game server. Every game is a task driving State.game(): decisions of bots are answered in place, decisions of
+remote players are sent over their connection and awaited, so one process can host thousands of games without a
+thread per game.
+
+Protocol: newline-delimited JSON over TCP. The client opens with {"name": ...} and then receives
+    {"type": "game_start", "players": [...], "supply": [...]}
+    {"type": "decision", "id": n, "kind": ..., "prompt": ..., "cards": [...], "indices": [...], "skip": ...,
+     "can_skip": ..., "hand": [...], ...}
+    {"type": "game_end", "victory_points": {...}, "reason": ...}
+and answers every decision with {"id": n, "answer": ...}, the answer being a supply position from indices or skip
+(see decisions.Decision), or a card name or 'Skip' ('Y' or 'N' for reactions) like Player.get_input. Decisions not
+answered within the timeout, or after the client disconnected, are answered by the fallback bot; late answers are
+ignored.
+
+    python server.py serve --port 8765
+    python server.py connect --port 8765 --name alice
+"""
+import argparse
+import asyncio
+import json
+import sys
+from time import perf_counter
+from typing import Dict, List, Optional, Type
+
+from abstract_cards import Card
+from bots import BigMoneyBot
+from decisions import Decision
+from player import Player
+from profiling import DECISION, GameStats
+from recommended_kingdoms import FIRST_GAME, initialize_kingdom
+from simulation import GameResult, game_result
+from state import State
+
+# Number of bot decisions a game may answer in a row before it lets other games run
+BOT_DECISIONS_PER_SLICE = 64
+
+
+class RemotePlayer(Player):
+    """
+    Player connected over a stream. Its decisions are sent to the client and awaited with a timeout.
+    """
+
+    def __init__(self, name, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float = 60.0,
+                 fallback: Type[Player] = BigMoneyBot):
+        """
+        :param name: Name of the player
+        :param reader: Stream the answers are read from
+        :param writer: Stream the messages are written to
+        :param timeout: Seconds a decision may take before the fallback answers it
+        :param fallback: Bot class answering timed out decisions and all decisions after a disconnect
+        """
+        super().__init__(name)
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.fallback = fallback
+        self.connected = True
+        self.num_timeouts = 0
+        self._decision_id = 0
+
+    async def send(self, message: Dict):
+        if not self.connected:
+            return
+        try:
+            self.writer.write(json.dumps(message).encode() + b'\n')
+            await self.writer.drain()
+        except ConnectionError:
+            self.connected = False
+
+    async def decide_async(self, decision: Decision):
+        """
+        Sends the decision to the client and returns its answer, or the answer of the fallback. Like Player.decide, the
+        decision is timed (including the wait for the client) if the game has stats and recorded if it has a recorder.
+        """
+        state = decision.state
+        start = perf_counter()
+        answer = await self._answer(decision)
+        if state.stats is not None:
+            state.stats.add(DECISION, self.__class__.__name__, perf_counter() - start)
+        if state.recorder is not None:
+            state.recorder.record(decision, answer)
+        return answer
+
+    async def _answer(self, decision: Decision):
+        if self.connected:
+            self._decision_id += 1
+            state = decision.state
+            await self.send({
+                'type': 'decision',
+                'id': self._decision_id,
+                'kind': decision.kind,
+                'prompt': decision.line,
+                'cards': [card.name for card in decision.cards],
+                'indices': decision.indices,
+                'skip': decision.skip,
+                'can_skip': decision.can_skip,
+                'phase': state.phase,
+                'hand': [card.name for card in self.cards(self.hand)],
+                'money': self.money,
+                'actions': self.actions,
+                'buys': self.buys,
+            })
+            try:
+                answer = await asyncio.wait_for(self._read_answer(self._decision_id), self.timeout)
+                # JSON true and false are ints in Python, not supply positions: they skip like unknown card names
+                if isinstance(answer, int) and not isinstance(answer, bool):
+                    return decision.from_index(answer)
+                if answer is not None:
+                    return decision.parse(str(answer))
+            except asyncio.TimeoutError:
+                self.num_timeouts += 1
+        return decision.from_index(self.fallback.choose(self, decision))
+
+    async def _read_answer(self, decision_id: int) -> Optional[str]:
+        # Skips answers to earlier, timed out decisions. Returns None if the client disconnected.
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                self.connected = False
+                return None
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get('id') == decision_id:
+                return message.get('answer')
+
+
+async def run_game_async(players: List[Player], kingdom: List[Type[Card]] = FIRST_GAME, seed: int = None,
+                         max_turn_number: int = 25, recorder: 'DecisionRecorder' = None,
+                         stats: GameStats = None) -> GameResult:
+    """
+    Plays a game as an asyncio task. Remote players are awaited, all other players answer in place.
+    :param recorder: Optional DecisionRecorder that records every decision of the game
+    :param stats: Optional GameStats the timings of the game are added to
+    """
+    state = State(players, initialize_kingdom(kingdom, len(players)), max_turn_number, seed)
+    state.recorder = recorder
+    state.stats = stats
+    remote_players = [player for player in players if isinstance(player, RemotePlayer)]
+    for player in remote_players:
+        await player.send({
+            'type': 'game_start',
+            'players': [player.name for player in players],
+            'supply': [card.name for card in state.supply],
+        })
+
+    coroutine = state.game()
+    answer = None
+    bot_decisions = 0
+    try:
+        while True:
+            decision = coroutine.send(answer)
+            if isinstance(decision.player, RemotePlayer):
+                answer = await decision.player.decide_async(decision)
+            else:
+                answer = decision.player.decide(decision)
+                bot_decisions += 1
+                if bot_decisions == BOT_DECISIONS_PER_SLICE:
+                    bot_decisions = 0
+                    await asyncio.sleep(0)
+    except StopIteration:
+        pass
+    if recorder is not None:
+        recorder.end_game(state)
+
+    result = game_result(state, seed)
+    for player in remote_players:
+        await player.send({
+            'type': 'game_end',
+            'victory_points': result.victory_points,
+            'winners': result.winners,
+            'reason': result.end_reason,
+        })
+    return result
+
+
+class GameServer:
+    """
+    Starts a game against bots for every client that connects
+    """
+
+    def __init__(self, opponents: List[Type[Player]] = (BigMoneyBot,), kingdom: List[Type[Card]] = FIRST_GAME,
+                 timeout: float = 60.0, max_turn_number: int = 25):
+        """
+        :param opponents: Bot classes seated after the client
+        :param kingdom: Card classes making up the supply
+        :param timeout: Seconds per decision before the fallback bot answers
+        :param max_turn_number: Turn after which games are ended
+        """
+        self.opponents = list(opponents)
+        self.kingdom = kingdom
+        self.timeout = timeout
+        self.max_turn_number = max_turn_number
+        self.num_games = 0
+        self.results: List[GameResult] = []
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            hello = json.loads(await asyncio.wait_for(reader.readline(), self.timeout) or b'{}')
+            name = str(hello.get('name') or f'Client{self.num_games + 1}')
+            self.num_games += 1
+            players = [RemotePlayer(name, reader, writer, self.timeout)] + [
+                bot_class(f'{bot_class.__name__}{seat + 2}') for seat, bot_class in enumerate(self.opponents)
+            ]
+            self.results.append(await run_game_async(players, self.kingdom, max_turn_number=self.max_turn_number))
+        except (asyncio.TimeoutError, ValueError, AttributeError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def connect(host: str, port: int, name: str):
+    """
+    Plays a game on a server, prompting on the console
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(json.dumps({'name': name}).encode() + b'\n')
+    await writer.drain()
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        if message['type'] == 'decision':
+            print(f'Hand: {message["hand"]}, money: {message["money"]}')
+            answer = await loop.run_in_executor(None, input, message['prompt'] + ' ')
+            writer.write(json.dumps({'id': message['id'], 'answer': answer.strip()}).encode() + b'\n')
+            await writer.drain()
+        else:
+            print(message)
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host or join Dominion games')
+    parser.add_argument('command', choices=['serve', 'connect'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--name', default='human')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds per decision')
+    args = parser.parse_args()
+    if args.command == 'serve':
+        asyncio.run(GameServer(timeout=args.timeout).serve(args.host, args.port))
+    else:
+        asyncio.run(connect(args.host, args.port, args.name))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+from collections import Counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Type
+import typing
+
+from abstract_cards import Card
+from game_log import NULL_LOGGER, GameLogger
+from player import Player
+from profiling import GameStats
+from recommended_kingdoms import FIRST_GAME, initialize_kingdom
+from state import State
+
+
+class GameResult(NamedTuple):
+    """
+    Compact record of a finished game
+    """
+    seed: Optional[int]
+    turn_number: int
+    winners: List[str]
+    victory_points: Dict[str, int]
+    decks: Dict[str, typing.Counter[str]]
+    end_reason: Optional[str]
+
+
+def run_game(players: List[Player], kingdom: List[Type[Card]] = FIRST_GAME, seed: int = None,
+             max_turn_number: int = 25, recorder: 'DecisionRecorder' = None,
+             logger: GameLogger = None, replay: 'ReplayWriter' = None, stats: GameStats = None) -> GameResult:
+    """
+    Plays a single game without any console I/O and returns its result.
+    :param players: Players in turn order. Player names must be unique.
+    :param kingdom: Card classes making up the supply
+    :param seed: Seed of the game
+    :param max_turn_number: Turn after which the game is ended
+    :param recorder: Optional DecisionRecorder that records every decision of the game
+    :param logger: Optional logger receiving the events of the game
+    :param replay: Optional ReplayWriter the game is appended to
+    :param stats: Optional GameStats the timings of the game are added to
+    """
+    if replay is not None:
+        logger = (logger or NULL_LOGGER).with_sink(replay)
+    supply = initialize_kingdom(kingdom, len(players))
+    state = State(players, supply, max_turn_number, seed, logger)
+    state.recorder = recorder
+    state.stats = stats
+    state.play()
+    if recorder is not None:
+        recorder.end_game(state)
+    return game_result(state, seed)
+
+
+def run_games(num_games: int, bot_classes: List[Type[Player]], kingdom: List[Type[Card]] = FIRST_GAME,
+              seed: int = None, max_turn_number: int = 25,
+              recorder: 'DecisionRecorder' = None, stats: GameStats = None) -> Iterator[GameResult]:
+    """
+    Plays a batch of games between the given bots. Game i is seeded with seed + i. Players are named after their class
+    and seat, e.g. 'RandomBot1'. One State and one instance per bot play all games: the state is reset in place
+    between games, so bots must not keep state of their own across games.
+    """
+    players = [bot_class(f'{bot_class.__name__}{seat + 1}') for seat, bot_class in enumerate(bot_classes)]
+    state = State(players, initialize_kingdom(kingdom, len(players)), max_turn_number)
+    state.recorder = recorder
+    state.stats = stats
+    for i in range(num_games):
+        game_seed = None if seed is None else seed + i
+        state.reset(game_seed)
+        state.play()
+        if recorder is not None:
+            recorder.end_game(state)
+        yield game_result(state, game_seed)
+
+
+def game_result(state: State, seed: int = None) -> GameResult:
+    victory_points = {player.name: player.victory_points for player in state.players}
+    most_victory_points = max(victory_points.values())
+    return GameResult(
+        seed=seed,
+        turn_number=state.turn_number,
+        winners=[name for name, points in victory_points.items() if points == most_victory_points],
+        victory_points=victory_points,
+        decks={player.name: Counter({card.name: count for card, count in zip(state.supply, player.deck) if count})
+               for player in state.players},
+        end_reason=state.game_end_reason(),
+    )
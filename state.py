@@ -1,13 +1,16 @@
-from typing import List, Type
-from collections import Counter
+from bisect import bisect_right
+from time import perf_counter
+from typing import Any, Dict, Generator, List, Optional, Type
 import random
 
-from bots import RandomBot, ExpensiveBot, BigMoneyBot
 from abstract_cards import Card
-from bot import bot_state
 from cards import Estate, Copper, Province
-from constants import ACTION_PHASE, BUY_PHASE, TREASURE_PHASE
+from decisions import Decision
+from game_log import DEBUG, INFO, NULL_LOGGER, GameLogger, TextSink
+from constants import ACTION_PHASE, BUY_PHASE, TREASURE_PHASE, PROVINCE_PILE_EMPTY, SUPPLY_PILES_EMPTY, \
+    TURN_LIMIT_REACHED
 from player import Player
+from profiling import CLEANUP_PHASE, PHASE, GameStats
 from recommended_kingdoms import FIRST_GAME, initialize_kingdom
 
 MAXIMUM_NUMBER_OF_ROUNDS = 20
@@ -25,122 +28,391 @@ class CardNotInSupply(Exception):
     """ Raised when trying to get a card reference that is not in the supply """
 
 
+class SupplyIndexConflict(Exception):
+    """ Raised when a card instance is placed at a different supply position than in another game """
+
+
 class State:
-    def __init__(self, players: List[Player], supply: List[Card], max_turn_number=25, seed=None):
-        if seed:
-            random.seed(seed)
+    def __init__(self, players: List[Player], supply: List[Card], max_turn_number=25, seed=None,
+                 logger: GameLogger = None):
+        # Every game owns its random number generator so games can be interleaved and still be replayed by seed
+        self.rng = random.Random(seed)
+        self.seed = seed
         self.current_player = None
         self.phase = None
         self.players = players
         self.supply = supply
-        starting_card = 3 * [self.get_card(Estate)] + 7 * [self.get_card(Copper)]
+        # Card instances are shared between games (see initialize_kingdom), so a card keeps the position it was first
+        # placed at. Reordering or subsetting a supply list would silently corrupt the other games using its cards.
+        for index, card in enumerate(self.supply):
+            if card.supply_index is None:
+                card.supply_index = index
+            elif card.supply_index != index:
+                raise SupplyIndexConflict(
+                    f'{card.name} is at supply position {card.supply_index} in another game, not {index}. '
+                    f'Create the supply with initialize_kingdom for every kingdom order.'
+                )
+
+        # Supply indexes, built once per game
+        self.card_by_class: Dict[Type[Card], Card] = {card.__class__: card for card in self.supply}
+        self.card_by_name: Dict[str, Card] = {card.name: card for card in self.supply}
+        self.playable_by_phase: Dict[str, List[Card]] = {
+            phase: [card for card in self.supply if phase in card.playability]
+            for phase in (ACTION_PHASE, TREASURE_PHASE, BUY_PHASE)
+        }
+
+        self._cards_by_price: List[Card] = sorted(self.supply, key=lambda card: card.price)
+        self.max_empty_supply_piles = 3 if len(self.players) <= 3 else 4
+
+        # Starting template, restored by reset
+        self._starting_supply_sizes = tuple(card.starting_supply_pile_size for card in self.supply)
+        self._starting_cards = (3 * (self.get_card(Estate).supply_index,) +
+                                7 * (self.get_card(Copper).supply_index,))
+        self._no_cards = (0,) * len(self.supply)
+
+        # Number of cards left in each supply pile, indexed by supply position
+        self.supply_sizes: List[int] = list(self._starting_supply_sizes)
+        self._index_supply()
+
+        self.logger = logger or NULL_LOGGER
+        if self.logger.level <= INFO:
+            self.logger.log(INFO, 'game_start', seed=seed, players=self.players, supply=self.supply)
+
         for player in self.players:
-            player.draw_pile = random.sample(starting_card, len(starting_card))
+            player.rng = self.rng
+            player.setup_zones(self.supply, self._starting_cards)
             player.draw(5)
-        self.trash = Counter()
+
+        # Number of copies of each card in the trash, indexed by supply position
+        self.trash: List[int] = list(self._no_cards)
 
         self.turn_number = 0
         self.max_turn_number = max_turn_number
 
+        # Optional DecisionRecorder that records every decision answered with Player.decide
+        self.recorder = None
+
+        # Optional GameStats that times the phases, card resolution and decisions
+        self.stats: Optional[GameStats] = None
+
+    @property
+    def logger(self) -> GameLogger:
+        return self._logger
+
+    @logger.setter
+    def logger(self, logger: GameLogger):
+        # Players log through the game's logger
+        self._logger = logger
+        for player in self.players:
+            player.logger = logger
+
+    def reset(self, seed: int = None):
+        """
+        Restarts the game in place with the same players and supply, as if it was newly created with the seed. All
+        card areas are reused, so a single State can play any number of games without allocating new game objects.
+        """
+        self.rng.seed(seed)
+        self.seed = seed
+        self.current_player = None
+        self.phase = None
+        self.supply_sizes[:] = self._starting_supply_sizes
+        self._index_supply()
+
+        if self.logger.level <= INFO:
+            self.logger.log(INFO, 'game_start', seed=seed, players=self.players, supply=self.supply)
+        for player in self.players:
+            player.reset_zones(self._starting_cards)
+            player.draw(5)
+
+        self.trash[:] = self._no_cards
+        self.turn_number = 0
+
     def add_to_trash(self, card: Card):
-        self.trash[card] += 1
+        self.trash[card.supply_index] += 1
 
     def remove_from_trash(self, card: Card):
-        if card not in self.trash:
+        if not self.trash[card.supply_index]:
             raise CardNotInTrash
-        self.trash[card] -= 1
-        self.trash += Counter()
+        self.trash[card.supply_index] -= 1
         return card
 
-    @staticmethod
-    def remove_from_supply(card: Card):
-        if card.is_supply_empty():
+    def _index_supply(self):
+        """
+        Derives the game end tracking and the available cards from the supply pile sizes. These are afterwards
+        updated incrementally whenever a card leaves the supply.
+        """
+        supply_sizes = self.supply_sizes
+        self.num_empty_supply_piles = supply_sizes.count(0)
+        province = self.card_by_class.get(Province)
+        self.province_pile_empty = province is not None and not supply_sizes[province.supply_index]
+        # Cards with a non-empty supply pile ordered by price (and supply position), with their prices
+        self._available_cards: List[Card] = [card for card in self._cards_by_price if supply_sizes[card.supply_index]]
+        self._available_prices: List[int] = [card.price for card in self._available_cards]
+
+    def remove_from_supply(self, card: Card):
+        index = card.supply_index
+        if not self.supply_sizes[index]:
             raise SupplyPileIsEmpty
-        card.supply_pile_size -= 1
+        self.supply_sizes[index] -= 1
+        if not self.supply_sizes[index]:
+            # The pile just ran out, it is no longer available
+            self.num_empty_supply_piles += 1
+            if isinstance(card, Province):
+                self.province_pile_empty = True
+            index = self._available_cards.index(card)
+            del self._available_cards[index]
+            del self._available_prices[index]
         return card
 
     def get_card(self, card_class: Type[Card]) -> Card:
-        card = [card for card in self.supply if isinstance(card, card_class)][0]
-        if not card:
+        card = self.card_by_class.get(card_class)
+        if card is None:
+            # Fall back to the first card that is an instance of the class, e.g. for abstract card classes
+            card = next((card for card in self.supply if isinstance(card, card_class)), None)
+            if card is None:
+                raise CardNotInSupply
+        return card
+
+    def get_card_by_name(self, name: str) -> Card:
+        card = self.card_by_name.get(name)
+        if card is None:
             raise CardNotInSupply
         return card
 
-    def affordable_cards(self, money):
-        return [card for card in self.supply if card.price <= money and not card.is_supply_empty()]
+    def affordable_cards(self, money) -> List[Card]:
+        """
+        Returns the cards with a non-empty supply pile that cost at most money, ordered by price
+        """
+        return self._available_cards[:bisect_right(self._available_prices, money)]
 
-    def has_game_ended(self):
-        empty_supply_piles = [card for card in self.supply if card.is_supply_empty()]
-        max_empty = 3 if len(self.players) <= 3 else 4
-        return any(isinstance(card, Province) for card in empty_supply_piles) or len(
-            empty_supply_piles) >= max_empty or self.turn_number > self.max_turn_number
+    def clone(self, seed: int = None, player_class: Type[Player] = None) -> 'State':
+        """
+        Returns an independent copy of the game, e.g. for rollouts. Cards and the supply indexes are immutable and
+        shared with the copy, the random number generator, card areas, supply pile sizes and effects are copied.
+        The recorder is not carried over.
+        :param seed: If given, the copy gets a new generator seeded with it instead of a copy of the generator,
+                     which is cheaper and gives the copy its own random future
+        :param player_class: If given, the players of the copy are instances of this class, e.g. a cheap policy
+        """
+        state = State.__new__(State)
+        state.__dict__.update(self.__dict__)
+        if seed is None:
+            state.rng = random.Random.__new__(random.Random)
+            state.rng.setstate(self.rng.getstate())
+        else:
+            state.rng = random.Random(seed)
+        state.players = [player.clone(state.rng, player_class) for player in self.players]
+        if self.current_player is not None:
+            state.current_player = state.players[self.players.index(self.current_player)]
+        state.supply_sizes = self.supply_sizes[:]
+        state.trash = self.trash[:]
+        state._available_cards = self._available_cards[:]
+        state._available_prices = self._available_prices[:]
+        state.recorder = None
+        state.stats = None
+        state.logger = NULL_LOGGER
+        return state
 
+    def snapshot(self) -> tuple:
+        """
+        Returns the mutable part of the game as a tuple of flat values that can be passed to restore
+        """
+        current_player = None if self.current_player is None else self.players.index(self.current_player)
+        return (
+            self.rng.getstate(),
+            tuple(self.supply_sizes),
+            tuple(self.trash),
+            self.turn_number,
+            self.phase,
+            current_player,
+            tuple(player.snapshot() for player in self.players),
+        )
 
-# TODO: in Game loop , resolve effects at start of and end of buy / action
-def main():
-    players = [RandomBot('bot1'), ExpensiveBot('bot2')]
-    num_players = len(players)
-    supply = initialize_kingdom(FIRST_GAME, num_players)
-    state = State(players, supply, 42)
-    while not state.has_game_ended():
-        print(f'TURN {state.turn_number}')  # TODO: Use textwrap for nice printouts
-        for player in state.players:
-            print(f"PLAYER {player.name}'S TURN")
-            print(player.hand)
-            state.current_player = player
-
-            # Play actions
-            state.phase = ACTION_PHASE
-            print(f"PLAYER {player.name}'S ACTION PHASE")
-            print(f"PLAY ACTIONS")
-            print(bot_state(player, state))
-            while player.has_playable_cards_in_hand(state) and player.actions > 0:
-                selected_card = player.prompt_select_card(player.playable_cards(state), state)
+    def restore(self, snapshot: tuple):
+        """
+        Restores the game in place to a snapshot taken from this game
+        """
+        rng_state, supply_sizes, trash, self.turn_number, self.phase, current_player, players = snapshot
+        self.rng.setstate(rng_state)
+        self.supply_sizes[:] = supply_sizes
+        self.trash[:] = trash
+        self.current_player = None if current_player is None else self.players[current_player]
+        for player, player_snapshot in zip(self.players, players):
+            player.restore(player_snapshot)
+        self._index_supply()
+
+    def has_game_ended(self) -> bool:
+        return self.province_pile_empty or self.num_empty_supply_piles >= self.max_empty_supply_piles or \
+            self.turn_number > self.max_turn_number
+
+    def game_end_reason(self) -> Optional[str]:
+        """
+        Returns the condition that ended the game, or None if the game has not ended
+        """
+        if self.province_pile_empty:
+            return PROVINCE_PILE_EMPTY
+        if self.num_empty_supply_piles >= self.max_empty_supply_piles:
+            return SUPPLY_PILES_EMPTY
+        if self.turn_number > self.max_turn_number:
+            return TURN_LIMIT_REACHED
+        return None
+
+    def run(self, coroutine: Generator[Decision, Any, Any]):
+        """
+        Runs a coroutine of this game (e.g. game() or Player.play) to completion, answering every decision it yields
+        with Player.decide of the deciding player. Returns the return value of the coroutine.
+        """
+        try:
+            decision = next(coroutine)
+            while True:
+                decision = coroutine.send(decision.player.decide(decision))
+        except StopIteration as stop:
+            return stop.value
+
+    def play_turn(self, player: Player):
+        """
+        Plays a full turn (action, treasure, buy and cleanup phase) for the given player
+        """
+        self.run(self.turn(player))
+
+    def finish_turn(self):
+        """
+        Plays the rest of the current player's turn, starting from the current phase
+        """
+        self.run(self.rest_of_turn())
+
+    def play(self):
+        """
+        Plays turns until the game has ended. Does not do any console I/O.
+        """
+        self.run(self.game())
+
+    def finish_game(self):
+        """
+        Plays the rest of the game starting from the current phase of the current player's turn, e.g. in a clone
+        taken in the middle of a turn
+        """
+        self.run(self.rest_of_game())
+
+    def turn(self, player: Player):
+        """
+        Coroutine version of play_turn
+        """
+        self.current_player = player
+        self.phase = ACTION_PHASE
+        player.effects.fire(ACTION_PHASE, self)
+        yield from self.rest_of_turn()
+
+    def rest_of_turn(self):
+        """
+        Coroutine version of finish_turn
+        """
+        player = self.current_player
+        logger = self.logger
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
+        if logger.level <= DEBUG:
+            logger.log(DEBUG, 'hand', player=player, cards=player.cards(player.hand))
+
+        # Play actions
+        if self.phase == ACTION_PHASE:
+            if logger.level <= DEBUG:
+                logger.log(DEBUG, 'phase', player=player, phase=ACTION_PHASE)
+            while player.has_playable_cards_in_hand(self) and player.actions > 0:
+                selected_card = yield from player.prompt_select_card(player.playable_cards(self), self)
                 if not selected_card:
                     break
-                player.play(selected_card, state)
-                print(player.hand)
-                print(player.play_area)
-
-            # Play treasures
-            print(f"PLAYER {player.name}'S TREASURE PHASE")
-            print(f"PLAY TREASURES")
-            state.phase = TREASURE_PHASE
-            print(player.buys)
-            print(player.has_playable_cards_in_hand(state))
-            print('HANd ' + str(list(player.hand)))
-            while player.has_playable_cards_in_hand(state) and player.buys > 0:
-                selected_card = player.prompt_select_card(player.playable_cards(state), state)
+                yield from player.play(selected_card, self)
+            self.phase = TREASURE_PHASE
+            if stats is not None:
+                start = stats.lap(PHASE, ACTION_PHASE, start)
+            player.effects.fire(TREASURE_PHASE, self)
+
+        # Play treasures
+        if self.phase == TREASURE_PHASE:
+            if logger.level <= DEBUG:
+                logger.log(DEBUG, 'phase', player=player, phase=TREASURE_PHASE)
+            while player.has_playable_cards_in_hand(self) and player.buys > 0:
+                selected_card = yield from player.prompt_select_card(player.playable_cards(self), self)
                 # If no card is selected, end treasure playing
                 if not selected_card:
                     break
-                player.play(selected_card, state)
-                print(player.hand)
-                print(player.play_area)
-
-            # Buy cards
-            print(f"PLAYER {player.name}'S BUY PHASE")
-            print(f"BUY CARDS")
-            state.phase = BUY_PHASE
-            while player.buys > 0:
-                selected_card = player.prompt_select_card(state.affordable_cards(player.money), state)
-                if not selected_card:
-                    break
-                player.buy(selected_card, State)
-                print(selected_card)
+                yield from player.play(selected_card, self)
+            self.phase = BUY_PHASE
+            if stats is not None:
+                start = stats.lap(PHASE, TREASURE_PHASE, start)
+            player.effects.fire(BUY_PHASE, self)
 
-            # Cleanup
-            player.reset_turn_attributes()
-            player.cleanup()
-            print(player.hand)
-            player.draw(5)
+        # Buy cards
+        if logger.level <= DEBUG:
+            logger.log(DEBUG, 'phase', player=player, phase=BUY_PHASE)
+        while player.buys > 0:
+            selected_card = yield from player.prompt_select_card(self.affordable_cards(player.money), self)
+            if not selected_card:
+                break
+            player.buy(selected_card, self)
+        if stats is not None:
+            start = stats.lap(PHASE, BUY_PHASE, start)
+
+        # Cleanup
+        if logger.level <= DEBUG:
+            logger.log(DEBUG, 'cleanup', player=player)
+        player.reset_turn_attributes()
+        player.cleanup()
+        player.effects.end_turn(player)
+        player.draw(5)
+        if stats is not None:
+            stats.lap(PHASE, CLEANUP_PHASE, start)
+
+    def game(self):
+        """
+        Coroutine version of play
+        """
+        while not self.has_game_ended():
+            if self.logger.level <= INFO:
+                self.logger.log(INFO, 'turn', turn_number=self.turn_number)
+            if self.logger.level <= DEBUG:
+                # Everything needed to rebuild the card areas at the start of the turn (play areas are empty)
+                self.logger.log(
+                    DEBUG, 'snapshot', turn_number=self.turn_number, supply_sizes=tuple(self.supply_sizes),
+                    trash=tuple(self.trash), decks=[tuple(player.deck) for player in self.players],
+                    hands=[tuple(player.hand) for player in self.players],
+                    discard_piles=[tuple(player.discard_pile) for player in self.players],
+                )
+            for player in self.players:
+                yield from self.turn(player)
+            self.turn_number += 1
+        if self.logger.level <= INFO:
+            self.logger.log(INFO, 'game_end', reason=self.game_end_reason(), turn_number=self.turn_number,
+                            victory_points={player.name: player.victory_points for player in self.players})
 
-        state.turn_number += 1
+    def rest_of_game(self):
+        """
+        Coroutine version of finish_game
+        """
+        seat = self.players.index(self.current_player)
+        yield from self.rest_of_turn()
+        for player in self.players[seat + 1:]:
+            yield from self.turn(player)
+        self.turn_number += 1
+        yield from self.game()
+
+
+def main():
+    # Imported here: the bots package is not needed to play games and pulls in the Monte Carlo bot's process pool
+    from bots import RandomBot, ExpensiveBot
+    players = [RandomBot('bot1'), ExpensiveBot('bot2')]
+    num_players = len(players)
+    supply = initialize_kingdom(FIRST_GAME, num_players)
+    state = State(players, supply, 42, logger=GameLogger([TextSink()], DEBUG))
+    state.play()
 
     # Print final results
     for player in state.players:
         print(f'TURN NUMBER: {state.turn_number}')
         print(f'Player: {player.name}, VP: {player.victory_points}')
-        print(player.deck)
+        print(player.cards(player.deck))
 
 
 if __name__ == '__main__':
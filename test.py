@@ -1,3 +1,204 @@
+import random
+from collections import Counter
+
+from bots import BigMoneyBot, ExpensiveBot, MonteCarloBot, RandomBot
+from cards import Copper, Curse, Estate, Merchant, Province, Silver
+from constants import ACTION_PHASE, BUY_PHASE, TREASURE_PHASE
+from decisions import SELECT, Decision
+from effects import NEXT_TURN, Effect
+from player import Player
+from probability import hypergeometric
+from recommended_kingdoms import FIRST_GAME, initialize_kingdom
+from replay import ReplayWriter, read_games
+from simulation import run_game, run_games
+from state import State
+
 # TODO: Add test for Player.prompt_discard
 # TODO: Add test for Player.prompt_gain
-# TODO: Add test for Player.draw
+
+
+def _new_game(seed: int) -> State:
+    players = [Player('a'), Player('b')]
+    return State(players, initialize_kingdom(FIRST_GAME, len(players)), seed=seed)
+
+
+def test_draw_first_hand_is_hypergeometric():
+    # Coppers in the first hand drawn from 7 Coppers and 3 Estates
+    num_games = 20_000
+    counts = Counter()
+    for seed in range(num_games):
+        state = _new_game(seed)
+        counts[state.players[0].hand[state.get_card(Copper).supply_index]] += 1
+    expected = hypergeometric(10, 7, 5)
+    for coppers in range(6):
+        assert abs(counts[coppers] / num_games - expected[coppers]) < 0.01
+
+
+def test_draw_reshuffles_the_discard_pile_when_empty():
+    state = _new_game(0)
+    player = state.players[0]
+    copper, estate, silver = state.get_card(Copper), state.get_card(Estate), state.get_card(Silver)
+    # 5 cards left in the draw pile, move 2 Silvers into the discard pile
+    player.discard_pile[silver.supply_index] = 2
+    player.deck[silver.supply_index] += 2
+    player.draw(5)
+    assert not player.draw_pile
+    assert sum(player.hand) == 10
+    assert player.hand[copper.supply_index] == 7 and player.hand[estate.supply_index] == 3
+
+    # The discard pile becomes the draw pile once the draw pile is empty
+    player.draw(1)
+    assert player.hand[silver.supply_index] == 1
+    assert sum(player.discard_pile) == 0
+    assert len(player.draw_pile) == 1
+
+    # Drawing stops when both piles are empty
+    player.draw(3)
+    assert player.hand[silver.supply_index] == 2
+    assert not player.draw_pile and sum(player.hand) == 12
+
+
+class _PublicRandom:
+    """ Random number generator implementing only the public method Player.draw needs """
+
+    def __init__(self, seed: int):
+        self._rng = random.Random(seed)
+
+    def randrange(self, n: int) -> int:
+        return self._rng.randrange(n)
+
+
+def test_draw_with_injected_generator():
+    player = _new_game(0).players[0]
+    player.rng = _PublicRandom(1)
+    player.draw(5)
+    assert sum(player.hand) == 10 and not player.draw_pile
+
+
+def test_merchant_adds_money_for_silver_at_the_buy_phase():
+    state = _new_game(0)
+    player = state.players[0]
+    merchant, silver = state.get_card(Merchant), state.get_card(Silver)
+    for card in (merchant, silver):
+        player.hand[card.supply_index] += 1
+        player.deck[card.supply_index] += 1
+    state.current_player = player
+    state.phase = ACTION_PHASE
+
+    state.run(player.play(merchant, state))
+    state.phase = TREASURE_PHASE
+    state.run(player.play(silver, state))
+    assert player.money == silver.worth and player.play_area[silver.supply_index] == 1
+    state.phase = BUY_PHASE
+    player.effects.fire(BUY_PHASE, state)
+    assert player.money == silver.worth + 1
+
+    # The effect expires with the turn
+    player.cleanup()
+    player.effects.end_turn(player)
+    assert len(player.effects) == 0
+
+
+def _play_rounds(state: State, num_rounds: int):
+    # Plays whole rounds, so play() can take over at the start of the next round
+    for _ in range(num_rounds):
+        for player in state.players:
+            state.play_turn(player)
+        state.turn_number += 1
+
+
+def _final(state: State):
+    return state.turn_number, [player.victory_points for player in state.players], [
+        tuple(player.deck) for player in state.players
+    ]
+
+
+def test_clone_and_restore_play_the_same_game():
+    players = [RandomBot('a'), ExpensiveBot('b')]
+    state = State(players, initialize_kingdom(FIRST_GAME, len(players)), seed=3)
+    _play_rounds(state, 6)
+    snapshot = state.snapshot()
+    clone = state.clone()
+
+    state.play()
+    clone.play()
+    assert _final(clone) == _final(state)
+
+    state.restore(snapshot)
+    expected = _final(clone)
+    state.play()
+    assert _final(state) == expected
+
+
+def test_run_games_plays_the_games_of_run_game():
+    bot_classes = [RandomBot, ExpensiveBot]
+    expected = [
+        run_game([bot_class(f'{bot_class.__name__}{seat + 1}') for seat, bot_class in enumerate(bot_classes)],
+                 seed=5 + i)
+        for i in range(4)
+    ]
+    assert list(run_games(4, bot_classes, seed=5)) == expected
+
+
+def test_reset_mid_game_starts_a_new_game():
+    players = [RandomBot('a'), ExpensiveBot('b')]
+    state = State(players, initialize_kingdom(FIRST_GAME, len(players)), seed=3)
+    _play_rounds(state, 4)
+    # Leave the game mid-turn with cards in the trash and effects pending
+    state.add_to_trash(state.get_card(Copper))
+    state.current_player = players[0]
+    state.phase = BUY_PHASE
+    players[0].effects.schedule(Effect(BUY_PHASE, lambda _: None))
+    players[1].effects.schedule(Effect(BUY_PHASE, lambda _: None, NEXT_TURN))
+
+    state.reset(11)
+    assert not any(state.trash)
+    assert all(len(player.effects) == 0 for player in players)
+    state.play()
+
+    players = [RandomBot('a'), ExpensiveBot('b')]
+    new_game = State(players, initialize_kingdom(FIRST_GAME, len(players)), seed=11)
+    new_game.play()
+    assert _final(state) == _final(new_game)
+
+
+def test_replay_reconstruct_matches_the_next_snapshot(tmp_path):
+    path = str(tmp_path / 'games.replay')
+    with ReplayWriter(path) as writer:
+        for seed in range(4):
+            run_game([RandomBot('a'), ExpensiveBot('b')], seed=seed, replay=writer)
+    games = list(read_games(path))
+    assert [game.seed for game in games] == list(range(4))
+    for game in games:
+        # Replaying all events of a turn ends where the snapshot of the next turn starts
+        for turn in range(len(game.turns) - 1):
+            assert game.reconstruct(turn) == game.reconstruct(turn + 1, 0)
+
+
+def _buy_decision(money: int, card_classes: list, last_turn: bool = False) -> Decision:
+    # Buy phase decision of a MonteCarloBot in the second seat of a seeded game
+    players = [BigMoneyBot('policy'), MonteCarloBot('search', playouts=2)]
+    state = State(players, initialize_kingdom(FIRST_GAME, len(players)), seed=0)
+    if last_turn:
+        state.turn_number = state.max_turn_number
+    search = players[1]
+    state.current_player = search
+    state.phase = BUY_PHASE
+    search.money = money
+    cards = [state.get_card(card_class) for card_class in card_classes]
+    return Decision(search, state, SELECT, 'Select a card from {cards}', cards)
+
+
+def test_monte_carlo_bot_buys_province_with_8_money():
+    # On the last turn the Province is worth its victory points, early on playouts are too noisy to rank it
+    decision = _buy_decision(8, [Curse, Copper, Province], last_turn=True)
+    assert decision.player.choose(decision) == decision.state.get_card(Province).supply_index
+
+
+def test_monte_carlo_bot_breaks_ties_toward_policy_then_skip():
+    # On the last turn buying a treasure cannot change the victory points, so all options tie. BigMoneyBot buys
+    # Silver with 4 money and skips with 2.
+    decision = _buy_decision(4, [Copper, Silver], last_turn=True)
+    assert decision.player.choose(decision) == decision.state.get_card(Silver).supply_index
+    decision = _buy_decision(2, [Curse, Copper], last_turn=True)
+    assert decision.player.choose(decision) == decision.skip
@@ -0,0 +1,155 @@
+import itertools
+import math
+import os
+import random
+import statistics
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple, Type
+
+from abstract_cards import Card
+from bots import RandomBot, ExpensiveBot, BigMoneyBot
+from player import Player
+from recommended_kingdoms import FIRST_GAME, initialize_kingdom
+from simulation import game_result
+from state import State
+
+# Number of standard deviations used for the confidence intervals (95%)
+Z_SCORE = 1.96
+
+
+class MatchupResult:
+    """
+    Aggregated results of all games played between two bots
+    """
+
+    def __init__(self, bots: Tuple[str, str]):
+        self.bots = bots
+        self.num_games = 0
+        self.wins: Dict[str, float] = {bot: 0.0 for bot in bots}
+        self.victory_points: Dict[str, List[int]] = {bot: [] for bot in bots}
+        self.turn_numbers: List[int] = []
+
+    def add(self, seating: Tuple[str, ...], victory_points: Tuple[int, ...], winners: Tuple[int, ...],
+            turn_number: int):
+        """
+        Adds a game to the matchup. Ties split the win between the tied bots.
+        :param seating: Bot names in turn order
+        :param victory_points: Victory points per seat
+        :param winners: Seats of the winning players
+        :param turn_number: Number of turns the game lasted
+        """
+        self.num_games += 1
+        for seat in winners:
+            self.wins[seating[seat]] += 1 / len(winners)
+        for bot, points in zip(seating, victory_points):
+            self.victory_points[bot].append(points)
+        self.turn_numbers.append(turn_number)
+
+    def win_rate(self, bot: str) -> float:
+        return self.wins[bot] / self.num_games if self.num_games else 0.0
+
+    def win_rate_interval(self, bot: str) -> Tuple[float, float]:
+        """
+        Wilson score interval of the win rate
+        """
+        n = self.num_games
+        if not n:
+            return 0.0, 1.0
+        p = self.win_rate(bot)
+        denominator = 1 + Z_SCORE ** 2 / n
+        center = (p + Z_SCORE ** 2 / (2 * n)) / denominator
+        margin = Z_SCORE * math.sqrt(p * (1 - p) / n + Z_SCORE ** 2 / (4 * n ** 2)) / denominator
+        return max(0.0, center - margin), min(1.0, center + margin)
+
+    def victory_point_mean(self, bot: str) -> float:
+        return statistics.fmean(self.victory_points[bot])
+
+    def victory_point_interval(self, bot: str) -> Tuple[float, float]:
+        """
+        Normal approximation interval of the mean victory points
+        """
+        points = self.victory_points[bot]
+        mean = statistics.fmean(points)
+        if len(points) < 2:
+            return mean, mean
+        margin = Z_SCORE * statistics.stdev(points) / math.sqrt(len(points))
+        return mean - margin, mean + margin
+
+    def victory_point_quantiles(self, bot: str, n: int = 4) -> List[float]:
+        return statistics.quantiles(self.victory_points[bot], n=n)
+
+    def __str__(self):
+        lines = [f'{self.bots[0]} vs {self.bots[1]} ({self.num_games} games)']
+        for bot in self.bots:
+            low, high = self.win_rate_interval(bot)
+            vp_low, vp_high = self.victory_point_interval(bot)
+            lines.append(
+                f'  {bot}: win rate {self.win_rate(bot):.3f} [{low:.3f}, {high:.3f}], '
+                f'VP {self.victory_point_mean(bot):.2f} [{vp_low:.2f}, {vp_high:.2f}]'
+            )
+        return '\n'.join(lines)
+
+
+def _play_chunk(task: Tuple[Tuple[Type[Player], ...], List[Type[Card]], int, int, int]):
+    """
+    Worker entry point. Plays a chunk of games with game seeds drawn from the chunk's own random stream.
+    """
+    bot_classes, kingdom, chunk_seed, num_games, max_turn_number = task
+    rng = random.Random(chunk_seed)
+    games = []
+    players = [bot_class(f'{bot_class.__name__}{seat + 1}') for seat, bot_class in enumerate(bot_classes)]
+    # One state plays the whole chunk, reset in place between games
+    state = State(players, initialize_kingdom(kingdom, len(players)), max_turn_number)
+    for _ in range(num_games):
+        game_seed = rng.getrandbits(32)
+        state.reset(game_seed)
+        state.play()
+        result = game_result(state, game_seed)
+        victory_points = tuple(result.victory_points[player.name] for player in players)
+        winners = tuple(seat for seat, player in enumerate(players) if player.name in result.winners)
+        games.append((victory_points, winners, result.turn_number))
+    return games
+
+
+def run_tournament(bot_classes: List[Type[Player]], games_per_matchup: int = 1000, seed: int = 0,
+                   kingdom: List[Type[Card]] = FIRST_GAME, processes: Optional[int] = None, chunk_size: int = 50,
+                   max_turn_number: int = 25) -> List[MatchupResult]:
+    """
+    Plays a round-robin tournament between the given bots on a process pool. Every matchup is played with both
+    seatings, half of the games each. The results only depend on the seed, not on the number of processes.
+    :param bot_classes: Bots taking part in the tournament
+    :param games_per_matchup: Number of games played per pair of bots
+    :param seed: Master seed from which all chunk seeds are derived
+    :param kingdom: Card classes making up the supply
+    :param processes: Size of the process pool. Defaults to the number of cores.
+    :param chunk_size: Number of games played per task
+    :param max_turn_number: Turn after which a game is ended
+    """
+    master_rng = random.Random(seed)
+    results = []
+    matchups = []
+    tasks = []
+    for bots in itertools.combinations(bot_classes, 2):
+        matchup = MatchupResult(tuple(bot.__name__ for bot in bots))
+        results.append(matchup)
+        for seating, num_games in ((bots, games_per_matchup - games_per_matchup // 2),
+                                   (bots[::-1], games_per_matchup // 2)):
+            for start in range(0, num_games, chunk_size):
+                chunk_games = min(chunk_size, num_games - start)
+                tasks.append((seating, kingdom, master_rng.getrandbits(64), chunk_games, max_turn_number))
+                matchups.append(matchup)
+    with Pool(processes or os.cpu_count()) as pool:
+        for task, matchup, games in zip(tasks, matchups, pool.imap(_play_chunk, tasks)):
+            seating = tuple(bot.__name__ for bot in task[0])
+            for victory_points, winners, turn_number in games:
+                matchup.add(seating, victory_points, winners, turn_number)
+    return results
+
+
+def main():
+    for matchup in run_tournament([RandomBot, ExpensiveBot, BigMoneyBot], games_per_matchup=200):
+        print(matchup)
+
+
+if __name__ == '__main__':
+    main()